@@ -1,9 +1,36 @@
+import os
+from functools import partial
+
+import altair as alt
 import streamlit as st
 import pandas as pd
 
-from utils.helpers import normalize_dataframe
-from utils.comparator import compute_differences
-from utils.similarity import compute_similarity
+from utils.cache import (
+    bytes_digest,
+    file_digest,
+    get_results,
+    load_standard,
+    put_results,
+    result_key,
+)
+from utils.incremental import (
+    can_update_incrementally,
+    incremental_update,
+    load_snapshot,
+    make_snapshot,
+    save_snapshot,
+    sg_digests,
+    shares_tenant,
+    snapshot_drift,
+)
+from utils.ingest import read_export
+from utils.instrumentation import diagnostics_panel, session_recorder, span
+from utils.baselines import available_baselines, baseline_overview
+from utils.comparator import compare_baselines
+from utils.report import build_sg_diff_summary
+from utils.jobs import get_job, single_flight, start_similarity_job
+from utils.similarity import similarity_pairs
+from utils.vocabulary import encoded
 
 # -------------------------------------------------------------------------
 # FORCE SIDEBAR TO DISPLAY "Home" INSTEAD OF APP FILENAME
@@ -14,6 +41,9 @@ st.set_page_config(
     page_icon="🏠"
 )
 
+recorder = session_recorder(st.session_state)
+recorder.begin("Home")
+
 # ----- FORCE SIDEBAR TITLE TO "Home" -----
 st.markdown("""
 <style>
@@ -89,21 +119,59 @@ st.markdown("""
 
 uploaded = st.file_uploader("", type=["xlsx"])
 
+client_name = None
+if uploaded:
+    client_name = st.text_input(
+        "Client name",
+        value=os.path.splitext(uploaded.name)[0],
+        help="Uploads with the same client name are compared with the previous upload "
+             "and only the changed security groups are re-analyzed."
+    )
+    st.session_state["client_name"] = client_name
+
 st.markdown("</div>", unsafe_allow_html=True)
 
 
 # -------------------------------------------------------------------------
 # LOAD STANDARD DATA
 # -------------------------------------------------------------------------
-STANDARD_FILE = "standard_data.xlsx"
+@st.cache_resource(show_spinner=False)
+def load_standard_baseline(path: str, digest: str) -> pd.DataFrame:
+    """
+    Standard baseline, loaded once per server process (per workbook hash)
+    and shared read-only by every session. It is tokenized once here,
+    into a vocabulary of its own.
+    """
+    std = load_standard(path, digest)
+    encoded(std)
+    return std
+
+
+baseline_files = available_baselines()
+if not baseline_files:
+    st.error("❌ No standard baseline workbook found.")
+    st.stop()
+
+PRIMARY_BASELINE = next(iter(baseline_files))
 
-if "std_df" not in st.session_state:
+baselines, baseline_digests = {}, {}
+for name, path in baseline_files.items():
     try:
-        raw_std = pd.read_excel(STANDARD_FILE)
-        st.session_state["std_df"] = normalize_dataframe(raw_std)
+        with span(f"load_baseline: {name}") as stage:
+            digest = file_digest(path)
+            baselines[name] = load_standard_baseline(path, digest)
+            stage["rows"] = len(baselines[name])
+        baseline_digests[name] = digest
     except Exception as e:
-        st.error(f"❌ Could not load standard_data.xlsx: {e}")
-        st.stop()
+        if name == PRIMARY_BASELINE:
+            st.error(f"❌ Could not load {path}: {e}")
+            st.stop()
+        st.warning(f"⚠️ Skipping baseline {name} ({path}): {e}")
+
+std_digest = baseline_digests[PRIMARY_BASELINE]
+st.session_state["std_df"] = baselines[PRIMARY_BASELINE]
+st.session_state["baselines"] = baselines
+st.session_state["primary_baseline"] = PRIMARY_BASELINE
 
 std_df = st.session_state["std_df"]
 
@@ -111,20 +179,116 @@ std_df = st.session_state["std_df"]
 # -------------------------------------------------------------------------
 # PROCESS CLIENT FILE
 # -------------------------------------------------------------------------
-if uploaded and (
-    "uploaded_filename" not in st.session_state
-    or st.session_state["uploaded_filename"] != uploaded.name
-):
+# Results are keyed by the upload's content hash plus the hashes of every
+# loaded baseline, so a renamed re-upload is served from cache and a
+# different file with the same name is not.
+def upload_digest(uploaded_file) -> str:
+    """
+    Content hash of the current upload, computed once per uploaded file.
+    """
+    file_id = getattr(uploaded_file, "file_id", None)
+    known = st.session_state.get("upload_digest")
+    if file_id is not None and known and known[0] == file_id:
+        return known[1]
+
+    digest = bytes_digest(uploaded_file.getvalue())
+    st.session_state["upload_digest"] = (file_id, digest)
+    return digest
+
+
+baselines_digest = bytes_digest(
+    "\n".join(f"{name}={digest}" for name, digest in baseline_digests.items()).encode()
+)
+with span("upload_digest"):
+    client_digest = upload_digest(uploaded) if uploaded else None
+    upload_key = result_key(client_digest, baselines_digest) if uploaded else None
+
+
+def load_client(uploaded_file):
+    """
+    Parse and tokenize an upload. Sessions opening the same file at the
+    same time share one parse (and one frame object) via single_flight.
+    """
+    client = read_export(uploaded_file)
+    encoded(client)
+    return client
+
+
+def use_previous_snapshot(client, key):
+    """
+    Previous upload of the same client, for drift and incremental updates.
+    A snapshot of this very upload only restores its drift; one of another
+    tenant saved under the same name is ignored.
+    """
+    st.session_state["snapshot_client"] = client_name
+    st.session_state.pop("drift", None)
+    st.session_state.pop("saved_key", None)
+
+    previous = load_snapshot(client_name)
+    if previous is not None and previous.get("upload_key") == key:
+        st.session_state["drift"] = previous.get("drift")
+        st.session_state["saved_key"] = key
+        previous = None
+    elif previous is not None and not shares_tenant(previous, client):
+        previous = None
+    st.session_state["previous_snapshot"] = previous
+    return previous
+
+
+if upload_key and st.session_state.get("upload_key") != upload_key:
     try:
-        raw_client_df = pd.read_excel(uploaded)
-        client_df = normalize_dataframe(raw_client_df)
+        with span("results_cache_lookup"):
+            cached = get_results(upload_key)
+
+        if cached is not None:
+            client_df = cached["client_df"]
+        else:
+            with span("read_export") as stage:
+                client_df = single_flight(
+                    "read_export", client_digest, partial(load_client, uploaded)
+                )
+                stage["rows"] = len(client_df)
+        with span("encode_client", rows=len(client_df)):
+            encoded(client_df)
 
         st.session_state["client_df"] = client_df
-        st.session_state["uploaded_filename"] = uploaded.name
+        st.session_state["upload_key"] = upload_key
 
         # Reset caches
         st.session_state.pop("diff_results", None)
+        st.session_state.pop("baseline_results", None)
         st.session_state.pop("similarity_results", None)
+        st.session_state.pop("similarity_pairs", None)
+        st.session_state.pop("similarity_clusters", None)
+        st.session_state.pop("similarity_job", None)
+        st.session_state.pop("neighbor_index", None)
+        st.session_state.pop("sg_detail_index", None)
+        st.session_state.pop("difference_report_cache", None)
+        st.session_state.pop("permission_index", None)
+        st.session_state.pop("drift", None)
+        st.session_state.pop("previous_snapshot", None)
+        st.session_state.pop("saved_key", None)
+
+        previous = use_previous_snapshot(client_df, upload_key)
+
+        if cached is not None:
+            st.session_state["diff_results"] = cached["diff_results"]
+            st.session_state["baseline_results"] = cached["baseline_results"]
+            st.session_state["similarity_results"] = cached["similarity_results"]
+            st.session_state["similarity_pairs"] = cached["similarity_pairs"]
+
+        elif can_update_incrementally(client_df, previous, std_digest):
+            with st.spinner("Updating analysis from the previous upload..."), \
+                    span("incremental_update", rows=len(client_df)):
+                diff_results, similarity_results, pairs, drift, _ = incremental_update(
+                    std_df, client_df, previous
+                )
+            st.session_state["diff_results"] = diff_results
+            # without pairs in the snapshot, similarity runs as a full background job
+            if pairs is not None:
+                st.session_state["similarity_results"] = similarity_results
+                st.session_state["similarity_pairs"] = pairs
+            st.session_state["drift"] = drift
 
         st.success("✅ Client file loaded successfully!")
 
@@ -132,8 +296,14 @@ if uploaded and (
         st.error(f"❌ Failed to load file: {e}")
         st.stop()
 
+# Renaming the client after loading switches to that client's snapshot:
+# drift is recomputed against it and this upload is saved under the name.
+elif upload_key and st.session_state.get("snapshot_client") != client_name:
+    use_previous_snapshot(st.session_state["client_df"], upload_key)
+
 if "client_df" not in st.session_state:
     st.info("⬆️ Please upload a client file to continue.")
+    diagnostics_panel(recorder)
     st.stop()
 
 client_df = st.session_state["client_df"]
@@ -142,18 +312,36 @@ client_df = st.session_state["client_df"]
 # -------------------------------------------------------------------------
 # COMPUTE DIFFERENCES (cached)
 # -------------------------------------------------------------------------
-if "diff_results" not in st.session_state:
-    with st.spinner("Computing differences..."):
-        only_in_std, only_in_client, diff_table = compute_differences(std_df, client_df)
-        st.session_state["diff_results"] = {
-            "only_in_std": only_in_std,
-            "only_in_client": only_in_client,
-            "diff_table": diff_table
-        }
+# The client is tokenized once; each baseline reuses that encoding.
+# Sessions comparing the same upload at the same time share one
+# computation (and its result objects, which are never mutated).
+if "baseline_results" not in st.session_state:
+    pending = {
+        name: std for name, std in baselines.items()
+        if name != PRIMARY_BASELINE or "diff_results" not in st.session_state
+    }
+    compare = partial(compare_baselines, pending, client_df)
+    with st.spinner("Computing differences..."), \
+            span("compare_baselines", rows=len(client_df), baselines=len(pending)):
+        if upload_key:
+            baseline_results = single_flight(
+                "compare_baselines", f"{upload_key}:{','.join(sorted(pending))}", compare
+            )
+        else:
+            baseline_results = compare()
+    baseline_results = {
+        name: baseline_results[name] if name in baseline_results
+        else st.session_state["diff_results"]
+        for name in baselines
+    }
+    st.session_state["baseline_results"] = baseline_results
+    st.session_state["diff_results"] = baseline_results[PRIMARY_BASELINE]
 
 only_in_std = st.session_state["diff_results"]["only_in_std"]
 only_in_client = st.session_state["diff_results"]["only_in_client"]
 diff_table = st.session_state["diff_results"]["diff_table"]
+diff_items = st.session_state["diff_results"]["diff_items"]
+diff_cube = st.session_state["diff_results"]["diff_cube"]
 
 
 # -------------------------------------------------------------------------
@@ -187,79 +375,218 @@ c3.markdown(f"""
 </div>
 """, unsafe_allow_html=True)
 
+if len(baselines) > 1:
+    st.markdown("#### ⚖️ Baselines Side by Side")
+    st.caption(f"Cards above and the Top 10 below use the primary baseline, {PRIMARY_BASELINE}.")
+    st.dataframe(
+        baseline_overview(st.session_state["baseline_results"]),
+        use_container_width=True,
+    )
+
 st.markdown("---")
 
 
 # -------------------------------------------------------------------------
 # TOP 10 DIFFERENCES
 # -------------------------------------------------------------------------
-def count_diff(std_val, client_val):
-    std_items = {x.strip() for x in str(std_val).splitlines() if x.strip()}
-    client_items = {x.strip() for x in str(client_val).splitlines() if x.strip()}
-    return len(std_items - client_items) + len(client_items - std_items)
+st.subheader("🏆 Top 10 SGs With Maximum Differences")
 
+if diff_table.empty:
+    st.info("✔ No differences found.")
+else:
+    with span("build_sg_diff_summary", rows=len(diff_cube.sg_names)):
+        top10 = build_sg_diff_summary(diff_cube).head(10).reset_index(drop=True)
+    top10.insert(0, "S.No", range(1, len(top10) + 1))
+
+    styled_df = (
+        top10.style
+        .set_properties(subset=["S.No"], **{"text-align": "center"})
+        .set_properties(subset=["Total Differences"], **{"text-align": "center"})
+        .set_properties(subset=["Security Group"], **{"text-align": "left"})
+    )
 
-def build_sg_diff_summary(diff_df):
-    summary = {}
+    st.dataframe(
+        styled_df,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "S.No": st.column_config.NumberColumn(
+                width=80,  # ≈ 2 cm
+            ),
+            "Total Differences": st.column_config.NumberColumn(
+                width=270,  # ≈ 7 cm
+            ),
+            "Security Group": st.column_config.TextColumn(
+                width="large"  # takes remaining space
+            ),
+        }
+    )
 
-    for _, row in diff_df.iterrows():
-        sg = row["SG Name"]
-        diff_count = count_diff(row["Standard Value"], row["Client Value"])
-        summary[sg] = summary.get(sg, 0) + diff_count
+    # ---------------------------------------------------------------------
+    # HEATMAP: differences per access type for the most affected SGs
+    # ---------------------------------------------------------------------
+    st.subheader("🗺️ Differences by Access Type")
+
+    h1, h2 = st.columns([1, 1])
+    heat_kind = h1.selectbox("Count", ["All", "Missing", "Extra"], key="heatmap_kind")
+    heat_rows = h2.slider("Security groups", 5, 50, 20, step=5, key="heatmap_rows")
+
+    with span("difference_heatmap", rows=len(diff_cube.sg_names)):
+        ranked = diff_cube.sg_totals()
+        if heat_kind != "All":
+            ranked = ranked[ranked[heat_kind] > 0].sort_values(heat_kind, ascending=False, kind="stable")
+        heat = diff_cube.by_access_type(
+            ranked["Security Group"].head(heat_rows),
+            kind=None if heat_kind == "All" else heat_kind,
+        )
+        cells = heat.reset_index().melt(
+            id_vars="Security Group", var_name="Access Type", value_name="Differences"
+        )
 
-    return (
-        pd.DataFrame(
-            [{"Security Group": sg, "Total Differences": count} for sg, count in summary.items()]
+    if cells.empty:
+        st.info(f"✔ No {heat_kind.lower()} items.")
+    else:
+        st.altair_chart(
+            alt.Chart(cells).mark_rect().encode(
+                x=alt.X(
+                    "Access Type:N",
+                    sort=list(heat.columns),
+                    axis=alt.Axis(labelAngle=-40, labelLimit=260),
+                ),
+                y=alt.Y(
+                    "Security Group:N",
+                    sort=list(heat.index),
+                    axis=alt.Axis(labelLimit=320),
+                ),
+                color=alt.Color("Differences:Q", scale=alt.Scale(scheme="reds")),
+                tooltip=["Security Group", "Access Type", "Differences"],
+            ).properties(height=max(200, 22 * len(heat))),
+            use_container_width=True,
         )
-        .sort_values("Total Differences", ascending=False)
-        .reset_index(drop=True)
-    )
 
 
-st.subheader("🏆 Top 10 SGs With Maximum Differences")
 
-if diff_table.empty:
-    st.info("✔ No differences found.")
-else:
-    top10 = build_sg_diff_summary(diff_table).head(10).reset_index(drop=True)
-top10.insert(0, "S.No", range(1, len(top10) + 1))
-
-styled_df = (
-    top10.style
-    .set_properties(subset=["S.No"], **{"text-align": "center"})
-    .set_properties(subset=["Total Differences"], **{"text-align": "center"})
-    .set_properties(subset=["Security Group"], **{"text-align": "left"})
-)
 
-st.dataframe(
-    styled_df,
-    use_container_width=True,
-    hide_index=True,
-    column_config={
-        "S.No": st.column_config.NumberColumn(
-            width=80,  # ≈ 2 cm
-        ),
-        "Total Differences": st.column_config.NumberColumn(
-            width=270,  # ≈ 7 cm
-        ),
-        "Security Group": st.column_config.TextColumn(
-            width="large"  # takes remaining space
-        ),
-    }
-)
+st.markdown("➡️ Use the sidebar for full Difference Report and Similarity Analysis.")
 
 
+# -------------------------------------------------------------------------
+# SAVE RESULTS + CLIENT SNAPSHOT (once per upload)
+# -------------------------------------------------------------------------
+def persist_results(key, name, baseline_digest, client, diff_results,
+                    baseline_results, digests, drift, similarity_results,
+                    similarity_pairs=None):
+    """
+    Cache an upload's results and save the client snapshot. Runs here when
+    similarity is already known, otherwise on the similarity worker thread
+    once the background job finishes (so no session state is touched).
+    """
+    put_results(key, {
+        "client_df": client,
+        "diff_results": diff_results,
+        "baseline_results": baseline_results,
+        "similarity_results": similarity_results,
+        "similarity_pairs": similarity_pairs,
+    })
+
+    if name:
+        save_snapshot(name, make_snapshot(
+            key,
+            baseline_digest,
+            digests,
+            diff_results,
+            similarity_results,
+            drift,
+            similarity_pairs,
+        ))
+
+
+upload_key = st.session_state.get("upload_key")
+
+if upload_key and st.session_state.get("saved_key") != upload_key:
+    with span("sg_digests", rows=len(client_df)):
+        digests = sg_digests(client_df)
+    previous = st.session_state.get("previous_snapshot")
+    if "drift" not in st.session_state and previous is not None:
+        st.session_state["drift"] = snapshot_drift(previous["digests"], digests)
+
+    persist = partial(
+        persist_results,
+        upload_key,
+        client_name,
+        std_digest,
+        client_df,
+        st.session_state["diff_results"],
+        st.session_state["baseline_results"],
+        digests,
+        st.session_state.get("drift"),
+    )
 
+    # Similarity runs in the background unless it is already known
+    # (cached or incrementally updated); results are saved once it is.
+    if "similarity_results" in st.session_state:
+        with span("save_results"):
+            persist(
+                st.session_state["similarity_results"],
+                st.session_state.get("similarity_pairs"),
+            )
+    else:
+        start_similarity_job(upload_key, client_df, on_done=persist)
+        st.session_state["similarity_job"] = upload_key
 
-st.markdown("➡️ Use the sidebar for full Difference Report and Similarity Analysis.")
+    st.session_state["saved_key"] = upload_key
+    st.session_state.pop("previous_snapshot", None)
 
 
 # -------------------------------------------------------------------------
-# COMPUTE SIMILARITY (cached)
+# SIMILARITY (background job progress)
 # -------------------------------------------------------------------------
+# Without an upload key there is nothing to key a shared job on.
+if "similarity_results" not in st.session_state and not upload_key:
+    with st.spinner("Computing SG similarity..."), \
+            span("compute_similarity", rows=len(client_df)):
+        pairs = similarity_pairs(client_df)
+    st.session_state["similarity_pairs"] = pairs
+    st.session_state["similarity_results"] = pairs.frame(0.90)
+
 if "similarity_results" not in st.session_state:
-    with st.spinner("Computing SG similarity..."):
-        st.session_state["similarity_results"] = compute_similarity(client_df)
+    job_key = st.session_state.get("similarity_job") or upload_key
+    if get_job(job_key) is None:
+        start_similarity_job(job_key, client_df)
+        st.session_state["similarity_job"] = job_key
+
+    @st.fragment(run_every=1.0)
+    def similarity_status():
+        job = get_job(job_key)
+        if job is None:
+            # finished jobs are pruned from the registry over time; run it
+            # again (or join the rerun another session already started)
+            job = start_similarity_job(job_key, client_df)
+        if job.status == "done":
+            st.session_state["similarity_results"] = job.result
+            st.session_state["similarity_pairs"] = job.pairs
+            st.rerun()
+        elif job.status == "error":
+            st.error(f"❌ Similarity analysis failed: {job.error}")
+        else:
+            st.progress(
+                job.progress,
+                text=f"🧬 Similarity analysis running in the background "
+                     f"({job.rows_done} of {job.rows_total} SGs scored)...",
+            )
+
+    similarity_status()
+else:
+    st.caption(
+        f"🧬 Similarity analysis complete: "
+        f"{len(st.session_state['similarity_results'])} similar SG pair(s)."
+    )
+
+
+# -------------------------------------------------------------------------
+# DIAGNOSTICS (optional sidebar panel)
+# -------------------------------------------------------------------------
+diagnostics_panel(recorder)
 
 
 # -------------------------------------------------------------------------
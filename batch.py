@@ -0,0 +1,166 @@
+"""
+Headless batch analysis of a folder of client security exports.
+
+    python batch.py exports/ -o batch_output --workers 8
+
+Every .xlsx in the folder is compared against the standard baseline in a
+process pool. Per-client results are written to <output>/<client>/ and a
+run summary to <output>/run_summary.csv and run_summary.json.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from utils.cache import load_standard
+from utils.comparator import compare_frames
+from utils.ingest import read_export
+from utils.similarity import compute_similarity
+from utils.vocabulary import encoded
+
+# Standard baseline of the current worker process, set (and tokenized) once
+# by _init_worker.
+_STD_DF = None
+
+
+def _init_worker(std_df: pd.DataFrame):
+    global _STD_DF
+    _STD_DF = std_df
+    encoded(_STD_DF)
+
+
+def analyze_file(path: str, output_dir: str, threshold: float, method: str) -> dict:
+    """
+    Load one client export, diff it against the worker's standard baseline,
+    compute SG similarity and write the results. Returns a summary row.
+    """
+    client = os.path.splitext(os.path.basename(path))[0]
+    summary = {"Client": client, "File": path}
+    started = time.perf_counter()
+
+    try:
+        client_df = read_export(path)
+        results = compare_frames(_STD_DF, client_df)
+        only_in_std = results["only_in_std"]
+        only_in_client = results["only_in_client"]
+        diff_table = results["diff_table"]
+        sim_df = compute_similarity(client_df, threshold=threshold, method=method)
+
+        client_dir = os.path.join(output_dir, client)
+        os.makedirs(client_dir, exist_ok=True)
+
+        pd.DataFrame({"Security Group": only_in_std}).to_csv(
+            os.path.join(client_dir, "missing_sgs.csv"), index=False
+        )
+        pd.DataFrame({"Security Group": only_in_client}).to_csv(
+            os.path.join(client_dir, "custom_sgs.csv"), index=False
+        )
+        diff_table.to_csv(os.path.join(client_dir, "differences.csv"), index=False)
+        results["diff_items"].drop(columns="Diff Row").to_csv(
+            os.path.join(client_dir, "difference_items.csv"), index=False
+        )
+        sim_df.to_csv(os.path.join(client_dir, "similarity.csv"), index=False)
+
+        summary.update({
+            "Status": "ok",
+            "Client SGs": len(client_df),
+            "Missing SGs": len(only_in_std),
+            "Custom SGs": len(only_in_client),
+            "Differences": len(diff_table),
+            "Difference Items": len(results["diff_items"]),
+            "Similar Pairs": len(sim_df),
+        })
+    except Exception as e:
+        summary.update({"Status": "error", "Error": f"{type(e).__name__}: {e}"})
+
+    summary["Seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def run_batch(
+    input_dir: str,
+    output_dir: str,
+    standard_file: str = "standard_data.xlsx",
+    workers: int = None,
+    threshold: float = 0.90,
+    method: str = "exact",
+) -> pd.DataFrame:
+    """
+    Analyze every .xlsx export in input_dir across a process pool.
+    The standard baseline is parsed once and handed to each worker, which
+    tokenizes it once for all of its files.
+    """
+    paths = sorted(
+        os.path.join(input_dir, name)
+        for name in os.listdir(input_dir)
+        if name.lower().endswith(".xlsx") and not name.startswith("~$")
+    )
+    os.makedirs(output_dir, exist_ok=True)
+
+    std_df = load_standard(standard_file)
+    started = time.perf_counter()
+
+    rows = []
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        initializer=_init_worker,
+        initargs=(std_df,),
+    ) as pool:
+        futures = [
+            pool.submit(analyze_file, path, output_dir, threshold, method)
+            for path in paths
+        ]
+        for future in as_completed(futures):
+            row = future.result()
+            rows.append(row)
+            print(f"[{len(rows)}/{len(paths)}] {row['Client']}: {row['Status']} ({row['Seconds']}s)")
+
+    summary = pd.DataFrame(rows)
+    if not summary.empty:
+        summary = summary.sort_values("Client").reset_index(drop=True)
+
+    failed = int((summary["Status"] == "error").sum()) if rows else 0
+
+    summary.to_csv(os.path.join(output_dir, "run_summary.csv"), index=False)
+    with open(os.path.join(output_dir, "run_summary.json"), "w") as f:
+        json.dump({
+            "standard_file": standard_file,
+            "files": len(paths),
+            "failed": failed,
+            "wall_seconds": round(time.perf_counter() - started, 3),
+            "clients": json.loads(summary.to_json(orient="records")),
+        }, f, indent=2)
+
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Batch-analyze client security exports.")
+    parser.add_argument("input_dir", help="Folder containing client .xlsx exports")
+    parser.add_argument("-o", "--output", default="batch_output", help="Output folder")
+    parser.add_argument("--standard", default="standard_data.xlsx", help="Standard baseline workbook")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--threshold", type=float, default=0.90, help="Similarity threshold")
+    parser.add_argument("--method", choices=["exact", "minhash"], default="exact", help="Similarity method")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(
+        args.input_dir,
+        args.output,
+        standard_file=args.standard,
+        workers=args.workers,
+        threshold=args.threshold,
+        method=args.method,
+    )
+
+    failed = int((summary["Status"] == "error").sum()) if not summary.empty else 0
+    print(f"Done: {len(summary)} file(s), {failed} failed. Results in {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
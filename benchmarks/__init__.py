@@ -0,0 +1,6 @@
+"""
+Benchmarks for the analysis hot paths on synthetic tenants.
+
+    python -m benchmarks.run --sgs 5000 -o bench.json
+    python -m benchmarks.run --sgs 5000 -o new.json --compare bench.json
+"""
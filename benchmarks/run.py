@@ -0,0 +1,212 @@
+"""
+Run the benchmark suite and save the timings as JSON.
+
+Every benchmark times only its measured call: per-repeat setup (fresh
+frame copies, so tokenization is not served from the encoding cache) is
+excluded. Results report min/median/mean seconds over the repeats.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.tenant import generate_tenant
+from utils.clustering import DuplicateClusters
+from utils.comparator import DiffCube, compute_differences, compare_frames
+from utils.helpers import normalize_dataframe
+from utils.report import DiffItemIndex, build_sg_diff_summary, difference_table_html
+from utils.similarity import MINHASH_RECALL_TARGET, compute_similarity, similarity_pairs
+
+# Rows rendered by the Difference Report HTML benchmark (one page).
+REPORT_PAGE_ROWS = 50
+
+
+def _time(fn, setup=None, repeat: int = 5, warmup: int = 1) -> dict:
+    """
+    Seconds per call of fn(*setup()), over `repeat` timed runs.
+    """
+    timings = []
+    for k in range(warmup + repeat):
+        args = setup() if setup else ()
+        started = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - started
+        if k >= warmup:
+            timings.append(elapsed)
+
+    return {
+        "repeat": repeat,
+        "min_s": round(min(timings), 6),
+        "median_s": round(statistics.median(timings), 6),
+        "mean_s": round(statistics.fmean(timings), 6),
+    }
+
+
+def _pair_set(df) -> set:
+    return set(zip(df["SG 1"], df["SG 2"]))
+
+
+def lsh_recall(client_df, threshold: float = 0.90, **minhash) -> dict:
+    """
+    Share of exact similarity pairs that the MinHash/LSH path also finds,
+    next to the documented target for the default settings.
+    """
+    exact = _pair_set(compute_similarity(client_df, threshold=threshold))
+    approx = _pair_set(compute_similarity(client_df, threshold=threshold, method="minhash", **minhash))
+    return {
+        "exact_pairs": len(exact),
+        "minhash_pairs": len(approx),
+        "recall": round(len(exact & approx) / len(exact), 4) if exact else 1.0,
+        "target": MINHASH_RECALL_TARGET,
+    }
+
+
+def run_benchmarks(
+    n_sgs: int = 2000,
+    items_per_cell: int = 4,
+    overlap: float = 0.8,
+    near_duplicate_rate: float = 0.1,
+    threshold: float = 0.90,
+    repeat: int = 5,
+    seed: int = 0,
+) -> dict:
+    """
+    Generate one tenant and benchmark the hot paths on it.
+    """
+    params = {
+        "n_sgs": n_sgs,
+        "items_per_cell": items_per_cell,
+        "overlap": overlap,
+        "near_duplicate_rate": near_duplicate_rate,
+        "threshold": threshold,
+        "repeat": repeat,
+        "seed": seed,
+    }
+    std_raw, client_raw = generate_tenant(
+        n_sgs=n_sgs,
+        items_per_cell=items_per_cell,
+        overlap=overlap,
+        near_duplicate_rate=near_duplicate_rate,
+        seed=seed,
+    )
+    std_df = normalize_dataframe(std_raw)
+    client_df = normalize_dataframe(client_raw)
+
+    def fresh():
+        return std_df.copy(), client_df.copy()
+
+    results = {}
+
+    results["normalize_dataframe"] = _time(
+        normalize_dataframe, lambda: (client_raw,), repeat
+    )
+    results["compute_differences"] = _time(compute_differences, fresh, repeat)
+
+    diff = compare_frames(std_df, client_df)
+    diff_table, diff_items = diff["diff_table"], diff["diff_items"]
+    results["compute_differences"].update({
+        "differences": len(diff_table),
+        "difference_items": len(diff_items),
+    })
+
+    results["compute_similarity"] = _time(
+        compute_similarity, lambda: (client_df.copy(), threshold), repeat
+    )
+    results["compute_similarity_minhash"] = _time(
+        lambda df: compute_similarity(df, threshold=threshold, method="minhash"),
+        lambda: (client_df.copy(),),
+        repeat,
+    )
+    results["lsh_recall"] = lsh_recall(client_df, threshold=threshold)
+
+    pairs = similarity_pairs(client_df)
+    results["duplicate_clusters"] = _time(
+        DuplicateClusters, lambda: (client_df, pairs, threshold), repeat
+    )
+    results["duplicate_clusters"]["clusters"] = len(DuplicateClusters(client_df, pairs, threshold))
+
+    results["diff_cube"] = _time(DiffCube.from_items, lambda: (diff_items,), repeat)
+    results["build_sg_diff_summary"] = _time(
+        build_sg_diff_summary, lambda: (diff["diff_cube"],), repeat
+    )
+
+    page = np.arange(min(REPORT_PAGE_ROWS, len(diff_table)))
+    results["difference_report_html"] = _time(
+        lambda: difference_table_html(
+            diff_table, DiffItemIndex(diff_items, len(diff_table)), page
+        ),
+        repeat=repeat,
+    )
+    results["difference_report_html"]["rows"] = len(page)
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+
+
+def compare_runs(current: dict, previous: dict) -> list:
+    """
+    (benchmark, previous median, current median, speedup) for the timed
+    benchmarks present in both runs.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        before = previous.get("results", {}).get(name, {})
+        if "median_s" in result and "median_s" in before:
+            speedup = before["median_s"] / result["median_s"] if result["median_s"] else float("inf")
+            rows.append((name, before["median_s"], result["median_s"], speedup))
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the analysis hot paths.")
+    parser.add_argument("--sgs", type=int, default=2000, help="SGs per tenant")
+    parser.add_argument("--items", type=int, default=4, help="Mean items per access-type cell")
+    parser.add_argument("--overlap", type=float, default=0.8, help="Share of standard SGs present in the client")
+    parser.add_argument("--near-duplicates", type=float, default=0.1, help="Share of near-duplicate client SGs")
+    parser.add_argument("--threshold", type=float, default=0.90, help="Similarity threshold")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Tenant generator seed")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="JSON results file")
+    parser.add_argument("--compare", default=None, help="Previous JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    run = run_benchmarks(
+        n_sgs=args.sgs,
+        items_per_cell=args.items,
+        overlap=args.overlap,
+        near_duplicate_rate=args.near_duplicates,
+        threshold=args.threshold,
+        repeat=args.repeat,
+        seed=args.seed,
+    )
+    with open(args.output, "w") as f:
+        json.dump(run, f, indent=2)
+
+    for name, result in run["results"].items():
+        detail = f"{result['median_s'] * 1000:10.2f} ms" if "median_s" in result else ""
+        extra = {k: v for k, v in result.items() if not k.endswith("_s") and k != "repeat"}
+        print(f"{name:30s}{detail} {extra if extra else ''}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print(f"\nvs {args.compare}:")
+        for name, before, after, speedup in compare_runs(run, previous):
+            print(f"{name:30s}{before * 1000:10.2f} ms -> {after * 1000:10.2f} ms  x{speedup:.2f}")
+
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
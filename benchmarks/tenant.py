@@ -0,0 +1,114 @@
+"""
+Synthetic Workday tenants for benchmarking.
+
+A tenant is a raw export frame with the ten EXPECTED_COLUMNS (the SG name
+column still under its export header), as read from a workbook before
+normalize_dataframe. Generation is deterministic for a given seed.
+"""
+import random
+
+import pandas as pd
+
+from utils.helpers import EXPECTED_COLUMNS
+
+SG_COLUMN = EXPECTED_COLUMNS[0]
+ACCESS_COLUMNS = EXPECTED_COLUMNS[1:]
+
+_AREAS = [
+    "Worker Data", "Compensation", "Benefits", "Payroll", "Time Tracking",
+    "Recruiting", "Learning", "Talent", "Absence", "Expenses", "Procurement",
+    "Financial Accounting", "Supplier Accounts", "Banking", "Projects",
+]
+_SUFFIXES = ["", ": Public", ": Private", ": Sensitive", " Reporting", " Administration"]
+
+
+def _item_pool(size: int, rng: random.Random):
+    """
+    `size` distinct domain/business-process style item names.
+    """
+    pool = []
+    for k in range(size):
+        area = _AREAS[k % len(_AREAS)]
+        suffix = _SUFFIXES[rng.randrange(len(_SUFFIXES))]
+        pool.append(f"{area}{suffix} {k:05d}")
+    return pool
+
+
+def _cell(rng: random.Random, pool, items_per_cell: int):
+    k = rng.randint(0, 2 * items_per_cell)
+    if k == 0:
+        return None
+    return "\n".join(rng.sample(pool, min(k, len(pool))))
+
+
+def _mutate(rng: random.Random, value, pool):
+    """
+    The cell with one item dropped or one item added (never identical).
+    """
+    items = value.split("\n") if value else []
+    if items and rng.random() < 0.5:
+        items.pop(rng.randrange(len(items)))
+    else:
+        items.append(pool[rng.randrange(len(pool))])
+        if len(set(items)) < len(items):
+            items = items[:-1] + [f"Custom {rng.randrange(10**6):06d}"]
+    return "\n".join(items) or None
+
+
+def generate_tenant(
+    n_sgs: int = 1000,
+    items_per_cell: int = 4,
+    overlap: float = 0.8,
+    near_duplicate_rate: float = 0.1,
+    diff_rate: float = 0.3,
+    vocab_size: int = 5000,
+    seed: int = 0,
+):
+    """
+    Returns (std_raw, client_raw) export frames.
+
+    - n_sgs: SGs in each of the standard and the client tenant
+    - items_per_cell: mean permission items per access-type cell
+    - overlap: share of standard SGs that also exist in the client
+      (the remainder of the client is custom SGs)
+    - near_duplicate_rate: share of client SGs that are a copy of another
+      client SG with a single item changed (similarity candidates)
+    - diff_rate: share of shared SGs with one access-type cell changed
+    - vocab_size: distinct permission items to draw from
+    """
+    rng = random.Random(seed)
+    pool = _item_pool(vocab_size, rng)
+
+    std_rows = [
+        [f"Standard SG {i:06d}"] + [_cell(rng, pool, items_per_cell) for _ in ACCESS_COLUMNS]
+        for i in range(n_sgs)
+    ]
+
+    n_shared = int(round(n_sgs * overlap))
+    client_rows = []
+    for row in rng.sample(std_rows, n_shared):
+        row = list(row)
+        if rng.random() < diff_rate:
+            col = rng.randrange(1, len(row))
+            row[col] = _mutate(rng, row[col], pool)
+        client_rows.append(row)
+    for i in range(n_sgs - n_shared):
+        client_rows.append(
+            [f"Custom SG {i:06d}"] + [_cell(rng, pool, items_per_cell) for _ in ACCESS_COLUMNS]
+        )
+
+    # near-duplicates overwrite other client SGs, keeping the SG count
+    n_dupes = min(int(round(len(client_rows) * near_duplicate_rate)), len(client_rows) // 2)
+    picked = rng.sample(range(len(client_rows)), 2 * n_dupes)
+    for i, (source, target) in enumerate(zip(picked[:n_dupes], picked[n_dupes:])):
+        copy = list(client_rows[source])
+        col = rng.randrange(1, len(copy))
+        copy[col] = _mutate(rng, copy[col], pool)
+        copy[0] = f"Copy of {copy[0]} {i}"
+        client_rows[target] = copy
+
+    rng.shuffle(client_rows)
+
+    std_raw = pd.DataFrame(std_rows, columns=EXPECTED_COLUMNS)
+    client_raw = pd.DataFrame(client_rows, columns=EXPECTED_COLUMNS)
+    return std_raw, client_raw
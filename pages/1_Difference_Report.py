@@ -1,6 +1,15 @@
 import streamlit as st
 import pandas as pd
-import html
+import numpy as np
+
+from utils.baselines import baseline_overview
+from utils.decisions import open_store
+from utils.export import export_report
+from utils.instrumentation import diagnostics_panel, session_recorder, span
+from utils.report import DiffItemIndex, difference_table_html
+
+recorder = session_recorder(st.session_state)
+recorder.begin("Difference Report")
 
 # ------------------------------------------------------------------------------
 # PAGE HEADER
@@ -25,9 +34,75 @@ if (
     st.error("⚠️ Please upload a client file on the main page.")
     st.stop()
 
-only_in_std = st.session_state["diff_results"]["only_in_std"]
-only_in_client = st.session_state["diff_results"]["only_in_client"]
-diff_table = st.session_state["diff_results"]["diff_table"].copy()
+# ------------------------------------------------------------------------------
+# BASELINES (side by side when more than one is registered)
+# ------------------------------------------------------------------------------
+baseline_results = st.session_state.get("baseline_results") or {
+    "Standard": st.session_state["diff_results"]
+}
+
+if len(baseline_results) > 1:
+    st.markdown("""
+<h3 style="color:#2A61FF;">Baselines Side by Side</h3>
+<p style="margin-bottom:12px; color:#666;">
+The client file compared against every registered standard baseline.
+</p>
+""", unsafe_allow_html=True)
+
+    st.dataframe(baseline_overview(baseline_results), use_container_width=True)
+
+    names = list(baseline_results)
+    missing_sets = {name: set(r["only_in_std"]) for name, r in baseline_results.items()}
+    all_missing = sorted(set().union(*missing_sets.values()))
+    if all_missing:
+        with st.expander(f"Missing Security Group(s) across baselines ({len(all_missing)})"):
+            st.dataframe(
+                pd.DataFrame(
+                    {name: ["✔" if sg in missing_sets[name] else "" for sg in all_missing] for name in names},
+                    index=pd.Index(all_missing, name="Security Group"),
+                ),
+                use_container_width=True,
+            )
+
+    primary = st.session_state.get("primary_baseline")
+    baseline = st.selectbox(
+        "Baseline for the report below",
+        names,
+        index=names.index(primary) if primary in names else 0,
+    )
+    st.markdown("<hr>", unsafe_allow_html=True)
+else:
+    baseline = next(iter(baseline_results))
+
+results = baseline_results[baseline]
+
+# ------------------------------------------------------------------------------
+# EXCEL EXPORT (written on click, cached per upload and baseline)
+# ------------------------------------------------------------------------------
+upload_key = st.session_state.get("upload_key")
+if upload_key:
+    similarity_results = st.session_state.get("similarity_results")
+    client_name = st.session_state.get("client_name") or ""
+
+    def report_bytes():
+        path = export_report(upload_key, results, similarity_results, baseline, client_name)
+        with open(path, "rb") as f:
+            return f.read()
+
+    st.download_button(
+        "⬇️ Download full report (.xlsx)",
+        report_bytes,
+        file_name=f"{client_name or 'client'} - {baseline} report.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        help="Missing and custom SGs, all item-level differences and similar SG pairs "
+             "in one workbook."
+             + ("" if similarity_results is not None else
+                " Similar pairs are left out until the similarity analysis finishes."),
+    )
+
+only_in_std = results["only_in_std"]
+only_in_client = results["only_in_client"]
+diff_table = results["diff_table"]
 
 # ------------------------------------------------------------------------------
 # SECTION 1 — MISSING IN CLIENT
@@ -102,6 +177,7 @@ Missing = red, Extra = black.
 
 if diff_table.empty:
     st.success("✔ No row-level differences found.")
+    diagnostics_panel(recorder)
     st.stop()
 
 
@@ -114,85 +190,103 @@ diff_table = diff_table.rename(columns={
 })
 
 # ------------------------------------------------------------------------------
-# BUILD PLAIN TEXT FOR DIFFERENCE ITEMS
+# ITEM-LEVEL DIFFERENCES (long format, produced by the comparator),
+# annotated with recorded accepted-risk / update decisions
 # ------------------------------------------------------------------------------
-def build_diff_items_list(std_val: str, client_val: str):
-    std_items = {
-        line.strip() for line in str(std_val).splitlines() if str(line).strip() != ""
-    }
-    client_items = {
-        line.strip() for line in str(client_val).splitlines() if str(line).strip() != ""
-    }
-
-    missing = sorted(list(std_items - client_items))
-    extra = sorted(list(client_items - std_items))
-
-    rows = []
-    for item in missing:
-        rows.append(("Missing", item))
-    for item in extra:
-        rows.append(("Extra", item))
-
-    return rows
-
-
-diff_table["Difference Items Raw"] = diff_table.apply(
-    lambda r: build_diff_items_list(r["Standard Value"], r["Client Value"]),
-    axis=1
+hide_accepted = st.checkbox(
+    "Hide accepted risks",
+    value=True,
+    help="Leave out differences recorded as accepted risk (see SG Detail View)."
 )
 
+# Labels and indexes are kept across reruns until the upload, baseline or
+# client changes, or a decision is recorded or removed.
+store = open_store()
+report_key = (upload_key, baseline, st.session_state.get("client_name") or "", store.revision)
+report_cache = st.session_state.get("difference_report_cache")
+if report_cache is None or report_cache["key"] != report_key:
+    diff_items = results["diff_items"]
+    with span("annotate_decisions", rows=len(diff_items)):
+        decisions = store.annotate_items(diff_items, report_key[2])["Decision"].to_numpy()
+    report_cache = {"key": report_key, "decisions": decisions, "indexes": {}}
+    st.session_state["difference_report_cache"] = report_cache
+
+if hide_accepted not in report_cache["indexes"]:
+    diff_items, decisions = results["diff_items"], report_cache["decisions"]
+    if hide_accepted:
+        keep = decisions != "Accepted Risk"
+        diff_items, decisions = diff_items[keep], decisions[keep]
+    with span("diff_item_index", rows=len(diff_items)):
+        report_cache["indexes"][hide_accepted] = DiffItemIndex(
+            diff_items, len(diff_table), labels=decisions
+        )
+
+item_index = report_cache["indexes"][hide_accepted]
+n_missing = item_index.n_missing
+n_extra = item_index.n_extra
+
 # ------------------------------------------------------------------------------
-# FLATTEN LIST INTO MULTILINE TEXT FOR DISPLAY
+# FILTERS (applied server-side, before any formatting)
 # ------------------------------------------------------------------------------
-def diff_text(row):
-    lines = []
-    for typ, item in row:
-        lines.append(f"{typ}: {item}")
-    return "\n".join(lines)
+f1, f2, f3 = st.columns([2, 2, 1])
 
-diff_table["Difference Items"] = diff_table["Difference Items Raw"].apply(diff_text)
+sg_query = f1.text_input("Search Security Group", "")
+access_types = f2.multiselect(
+    "Access Type",
+    sorted(diff_table["Access Type"].unique()),
+    default=[]
+)
+kind = f3.selectbox("Show", ["All", "Missing", "Extra"])
+
+with span("difference_filters", rows=len(diff_table)) as stage:
+    # rows whose differences are all accepted risks drop out when hidden
+    mask = (n_missing + n_extra) > 0
+    if sg_query.strip():
+        mask &= diff_table["Security Group"].astype(str).str.contains(
+            sg_query.strip(), case=False, regex=False
+        ).to_numpy()
+    if access_types:
+        mask &= diff_table["Access Type"].isin(access_types).to_numpy()
+    if kind == "Missing":
+        mask &= n_missing > 0
+    elif kind == "Extra":
+        mask &= n_extra > 0
+
+    positions = np.flatnonzero(mask)
+    stage["matches"] = len(positions)
+
+if len(positions) == 0:
+    st.info("No differences match the current filters.")
+    diagnostics_panel(recorder)
+    st.stop()
 
 # ------------------------------------------------------------------------------
-# APPLY COLOR WITH PANDAS STYLER
+# PAGINATION
 # ------------------------------------------------------------------------------
-def color_diff(val):
-    """Apply line-by-line coloring for Missing/Extra."""
-    if pd.isna(val):
-        return val
+p1, p2, p3 = st.columns([1, 1, 3])
 
-    lines = str(val).split("\n")
+page_size = p1.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+n_pages = (len(positions) + page_size - 1) // page_size
+page = p2.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1)
 
-    colored = []
-    for line in lines:
-        if line.startswith("Missing:"):
-            colored.append(f"<span style='color:red;font-weight:bold;'>{html.escape(line)}</span>")
-        elif line.startswith("Extra:"):
-            colored.append(f"<span style='color:black;'>{html.escape(line)}</span>")
-        else:
-            colored.append(html.escape(line))
-
-    return "<br>".join(colored)
+first = (page - 1) * page_size
+visible = positions[first:first + page_size]
 
+p3.markdown(
+    f"<div style='padding-top:32px; color:#666;'>"
+    f"Showing {first + 1}–{first + len(visible)} of {len(positions)} "
+    f"filtered differences ({len(diff_table)} total)</div>",
+    unsafe_allow_html=True
+)
 
 # ------------------------------------------------------------------
-# DISPLAY TABLE (same logic as original, just add S.No + hide index)
+# DISPLAY TABLE (visible page only, S.No continues across pages)
 # ------------------------------------------------------------------
-display_df = diff_table[[
-    "Security Group",
-    "Access Type",
-    # "Standard Value",   # Hidden intentionally
-    # "Client Value",     # Hidden intentionally
-    "Difference Items"
-]].copy()
-
-display_df = display_df.reset_index(drop=True)
-display_df.insert(0, "S.No", range(1, len(display_df) + 1))
-
-styled_df = display_df.style.format(
-    {"Difference Items": color_diff},
-    escape="html"
-)
-
-st.write(styled_df.hide(axis="index").to_html(), unsafe_allow_html=True)
+with span("difference_report_html", rows=len(visible)):
+    report_html = difference_table_html(
+        results["diff_table"], item_index, visible, kind, start=first + 1
+    )
 
+st.write(report_html, unsafe_allow_html=True)
 
+diagnostics_panel(recorder)
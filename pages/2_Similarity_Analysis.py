@@ -1,6 +1,15 @@
 import streamlit as st
 import pandas as pd
 
+from utils.cache import update_results
+from utils.clustering import DuplicateClusters
+from utils.decisions import open_store
+from utils.instrumentation import diagnostics_panel, session_recorder, span
+from utils.jobs import get_job, start_similarity_job
+
+recorder = session_recorder(st.session_state)
+recorder.begin("Similarity Analysis")
+
 # ------------------------------------------------------------------------------
 # PAGE HEADER
 # ------------------------------------------------------------------------------
@@ -20,11 +29,76 @@ if "client_df" not in st.session_state:
     st.error("⚠️ Please upload a client file on the main page.")
     st.stop()
 
-if "similarity_results" not in st.session_state:
-    st.error("⚠️ Similarity has not been computed yet. Please rerun the home page.")
+# ------------------------------------------------------------------------------
+# BACKGROUND JOB (progress and partial results while it runs)
+# ------------------------------------------------------------------------------
+# Results cached without their pairs (>= 90% only) are rescored the same way.
+if st.session_state.get("similarity_pairs") is None:
+    job_key = st.session_state.get("similarity_job") or st.session_state.get("upload_key")
+    if job_key is None:
+        st.info("ℹ️ Similarity analysis starts once the client file is loaded on the main page.")
+        st.stop()
+
+    client_df = st.session_state["client_df"]
+    on_done = None
+    if "similarity_results" in st.session_state:
+        # cached with the upload's results, so later sessions skip this pass
+        upload_key = st.session_state["upload_key"]
+
+        def on_done(result, pairs):
+            update_results(upload_key, similarity_pairs=pairs)
+
+    if get_job(job_key) is None:
+        start_similarity_job(job_key, client_df, on_done=on_done)
+        st.session_state["similarity_job"] = job_key
+
+    @st.fragment(run_every=1.0)
+    def similarity_progress():
+        job = get_job(job_key)
+        if job is None:
+            # finished jobs are pruned from the registry over time; run it
+            # again (or join the rerun another session already started)
+            job = start_similarity_job(job_key, client_df, on_done=on_done)
+        if job.status == "done":
+            st.session_state["similarity_results"] = job.result
+            st.session_state["similarity_pairs"] = job.pairs
+            st.rerun()
+        if job.status == "error":
+            st.error(f"❌ Similarity analysis failed: {job.error}")
+            return
+
+        st.progress(
+            job.progress,
+            text=f"🧬 Scoring security groups: {job.rows_done} of {job.rows_total} "
+                 f"({job.elapsed():.0f}s elapsed)",
+        )
+        partial = job.partial_results()
+        st.markdown(f"**Pairs found so far:** {len(partial)}")
+        if not partial.empty:
+            st.dataframe(partial, use_container_width=True)
+
+    similarity_progress()
+    diagnostics_panel(recorder)
     st.stop()
 
-sim_df = st.session_state["similarity_results"]
+# ------------------------------------------------------------------------------
+# THRESHOLD (slices the precomputed pairs, no recomputation)
+# ------------------------------------------------------------------------------
+pairs = st.session_state["similarity_pairs"]
+
+threshold = st.slider(
+    "Similarity threshold (%)",
+    min_value=int(round(pairs.floor * 100)),
+    max_value=100,
+    value=90,
+    step=1,
+    help="Pairs at or above this Jaccard similarity. Scores down to the lowest "
+         "threshold are computed once per upload, so changing it is instant."
+)
+
+with span("similarity_slice", rows=len(pairs)) as stage:
+    sim_df = pairs.frame(threshold / 100, order="score")
+    stage["matches"] = len(sim_df)
 
 # ------------------------------------------------------------------------------
 # SUMMARY CARD
@@ -42,11 +116,11 @@ st.markdown("""
         Similarity Overview
     </h3>
     <p style="margin:6px 0 0 0; color:#555; font-size:16px;">
-        Total high-similarity SG pairs detected: 
+        Total SG pairs at or above {threshold}% similarity:
         <strong>{count}</strong>
     </p>
 </div>
-""".format(count=len(sim_df)), unsafe_allow_html=True)
+""".format(count=len(sim_df), threshold=threshold), unsafe_allow_html=True)
 
 # ------------------------------------------------------------------------------
 # RESULTS TABLE
@@ -56,4 +130,63 @@ st.subheader("🔍 Similar SG Pairs")
 if sim_df.empty:
     st.info("✔ No similarity matches found above threshold.")
 else:
-    st.dataframe(sim_df, use_container_width=True)
+    # pairs already reviewed as duplicates (recorded in SG Detail View)
+    with span("annotate_decisions", rows=len(sim_df)):
+        reviewed = open_store().annotate_pairs(
+            sim_df, st.session_state.get("client_name") or ""
+        )
+    n_reviewed = int((reviewed["Decision"] != "").sum())
+
+    hide_reviewed = st.checkbox(
+        f"Hide reviewed duplicates ({n_reviewed})",
+        value=True,
+        disabled=n_reviewed == 0,
+    )
+
+    with span("similarity_table", rows=len(sim_df)):
+        table = pd.concat([sim_df, reviewed], axis=1)
+        if hide_reviewed:
+            table = table[table["Decision"] == ""].drop(columns=["Decision", "Decision Note"])
+        st.dataframe(table, use_container_width=True)
+
+# ------------------------------------------------------------------------------
+# DUPLICATE CLUSTERS (connected components of the pairs above threshold)
+# ------------------------------------------------------------------------------
+st.subheader("🧩 Duplicate Clusters")
+st.markdown("""
+<div style="color:#555; margin-bottom:10px;">
+Security groups linked by pairs at or above the threshold, grouped together. The
+suggested canonical SG is the member most similar to the others; the permissions
+below are those not held by every member of the selected cluster.
+</div>
+""", unsafe_allow_html=True)
+
+cached = st.session_state.get("similarity_clusters")
+if cached is None or cached.threshold != threshold / 100 or cached.pairs is not pairs:
+    with span("duplicate_clusters", rows=pairs.count(threshold / 100)) as stage:
+        cached = DuplicateClusters(st.session_state["client_df"], pairs, threshold / 100)
+        stage["clusters"] = len(cached)
+    st.session_state["similarity_clusters"] = cached
+clusters = cached
+
+if not len(clusters):
+    st.info("✔ No duplicate clusters above threshold.")
+else:
+    st.markdown(
+        f"**{len(clusters)}** cluster(s) covering **{int(clusters.sizes.sum())}** security groups."
+    )
+    st.dataframe(clusters.table(), use_container_width=True, hide_index=True)
+
+    cluster = st.selectbox(
+        "Cluster to inspect",
+        range(len(clusters)),
+        format_func=lambda c: f"{c + 1}: {clusters.canonical[c]} ({clusters.sizes[c]} SGs)",
+    )
+    with span("cluster_differences", rows=int(clusters.sizes[cluster])):
+        differences = clusters.differences(cluster)
+    if differences.empty:
+        st.success("✔ Every member of this cluster holds the same permissions.")
+    else:
+        st.dataframe(differences, use_container_width=True, hide_index=True)
+
+diagnostics_panel(recorder)
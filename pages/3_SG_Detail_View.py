@@ -1,6 +1,14 @@
 import streamlit as st
 import pandas as pd
 
+from utils.decisions import DECISION_KINDS, open_store
+from utils.instrumentation import diagnostics_panel, session_recorder, span
+from utils.report import SGDetailIndex
+from utils.similarity import NeighborIndex
+
+recorder = session_recorder(st.session_state)
+recorder.begin("SG Detail View")
+
 # ------------------------------------------------------------------------------
 # PAGE HEADER
 # ------------------------------------------------------------------------------
@@ -30,11 +38,19 @@ if "diff_results" not in st.session_state:
 client_df = st.session_state["client_df"]
 std_df = st.session_state["std_df"]
 diff_table = st.session_state["diff_results"]["diff_table"]
+diff_cube = st.session_state["diff_results"]["diff_cube"]
+
+# Per-SG positions, built once per upload; detail tables are cached per SG
+detail_index = st.session_state.get("sg_detail_index")
+if detail_index is None or not detail_index.matches(client_df, std_df, diff_table):
+    with span("sg_detail_index", rows=len(client_df)):
+        detail_index = SGDetailIndex(client_df, std_df, diff_table, diff_cube)
+    st.session_state["sg_detail_index"] = detail_index
 
 # ------------------------------------------------------------------------------
 # SELECT SECURITY GROUP
 # ------------------------------------------------------------------------------
-sg_list = sorted(client_df["SG Name"].unique())
+sg_list = detail_index.sg_list
 
 selected = st.selectbox(
     "Select a Security Group",
@@ -43,11 +59,8 @@ selected = st.selectbox(
     help="Choose an SG to view all access details."
 )
 
-row_client = client_df[client_df["SG Name"] == selected].iloc[0]
-
-# Try to load standard row (may not exist)
-std_matches = std_df[std_df["SG Name"] == selected]
-row_std = std_matches.iloc[0] if not std_matches.empty else None
+with span("sg_lookup"):
+    details = detail_index.details(selected)
 
 # ------------------------------------------------------------------------------
 # SECTION: SG SUMMARY CARD
@@ -73,15 +86,7 @@ Each category below shows the raw configured values for the selected SG.
 """, unsafe_allow_html=True)
 
 
-client_display_df = (
-    row_client
-    .drop(labels="SG Name")
-    .to_frame(name="Client Value")
-    .reset_index()
-    .rename(columns={"index": "Access Type"})
-)
-
-st.dataframe(client_display_df, use_container_width=True)
+st.dataframe(details["client"], use_container_width=True)
 
 
 # ------------------------------------------------------------------------------
@@ -91,15 +96,10 @@ st.markdown("""
 <h3 style="color:#2A61FF; margin-top:35px;">📘 Standard Access Comparison</h3>
 """, unsafe_allow_html=True)
 
-if row_std is None:
+if details["comparison"] is None:
     st.warning("ℹ️ This security group does **not** exist in the Standard dataset.")
 else:
-    compare_df = pd.DataFrame({
-        "Access Type": row_client.drop("SG Name").index,
-        "Client Value": row_client.drop("SG Name").values,
-        "Standard Value": row_std.drop("SG Name").values
-    })
-    st.dataframe(compare_df, use_container_width=True)
+    st.dataframe(details["comparison"], use_container_width=True)
 
 
 # ------------------------------------------------------------------------------
@@ -109,15 +109,130 @@ st.markdown("""
 <h3 style="color:#2A61FF; margin-top:35px;">⚡ Differences for This SG</h3>
 """, unsafe_allow_html=True)
 
-sg_diffs = diff_table[diff_table["SG Name"] == selected]
+sg_diffs_display = details["diffs"]
 
-if sg_diffs.empty:
+if sg_diffs_display.empty:
     st.success("✔ No differences for this security group.")
 else:
-    sg_diffs_display = sg_diffs.rename(columns={
-        "Column": "Access Type",
-        "Standard Value": "Standard Value",
-        "Client Value": "Client Value"
-    })[["Access Type", "Standard Value", "Client Value"]]
+    # item totals come from the precomputed SG x access-type cube
+    breakdown = details["breakdown"]
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Missing items", int(breakdown["Missing"].sum()))
+    m2.metric("Extra items", int(breakdown["Extra"].sum()))
+    m3.metric("Access types differing", len(breakdown))
+    st.dataframe(breakdown, use_container_width=True, hide_index=True)
 
     st.dataframe(sg_diffs_display, use_container_width=True)
+
+
+# ------------------------------------------------------------------------------
+# MOST SIMILAR SECURITY GROUPS (inverted index, built once per upload)
+# ------------------------------------------------------------------------------
+st.markdown("""
+<h3 style="color:#2A61FF; margin-top:35px;">🧭 Most Similar Security Groups</h3>
+<div style="color:#555; margin-bottom:10px;">
+Client security groups whose permission items overlap most with the selected SG
+(Jaccard similarity). Only groups sharing at least one item are scored.
+</div>
+""", unsafe_allow_html=True)
+
+if "neighbor_index" not in st.session_state:
+    with st.spinner("Indexing permission items..."), span("neighbor_index", rows=len(client_df)):
+        st.session_state["neighbor_index"] = NeighborIndex(client_df)
+
+n1, n2 = st.columns(2)
+top_k = n1.number_input("Show top", min_value=1, max_value=100, value=10, step=1)
+min_similarity = n2.slider("Minimum similarity (%)", 0, 100, 0, step=5)
+
+with span("nearest_sgs") as stage:
+    neighbors = st.session_state["neighbor_index"].nearest(
+        selected, k=int(top_k), threshold=min_similarity / 100
+    )
+    stage["rows"] = len(neighbors)
+
+if neighbors.empty:
+    st.info("ℹ️ No other security group shares permissions above this threshold.")
+else:
+    neighbors.insert(0, "S.No", range(1, len(neighbors) + 1))
+    st.dataframe(neighbors, use_container_width=True, hide_index=True)
+
+
+# ------------------------------------------------------------------------------
+# DECISIONS (accepted risk, update in Workday, duplicate SG)
+# ------------------------------------------------------------------------------
+st.markdown("""
+<h3 style="color:#2A61FF; margin-top:35px;">📝 Decisions</h3>
+<div style="color:#555; margin-bottom:10px;">
+Record how differences of this SG are handled. Accepted risks can be hidden in the
+Difference Report; reviewed duplicate pairs can be hidden in the Similarity Analysis.
+</div>
+""", unsafe_allow_html=True)
+
+store = open_store()
+client_name = st.session_state.get("client_name") or ""
+kind_of = {label: kind for kind, label in DECISION_KINDS.items()}
+
+with st.form("record_decision", clear_on_submit=True):
+    d1, d2 = st.columns(2)
+    label = d1.selectbox("Decision", list(kind_of))
+    access_type = d2.selectbox(
+        "Access Type",
+        ["All"] + [c for c in client_df.columns if c != "SG Name"],
+        help="Ignored for duplicates."
+    )
+    d3, d4 = st.columns(2)
+    item = d3.text_input("Item (optional)", help="Leave empty to cover every item.")
+    other_sg = d4.selectbox(
+        "Duplicate of",
+        [sg for sg in sg_list if sg != selected],
+        help="Only used for duplicates."
+    )
+    note = st.text_area("Note", height=80)
+    all_clients = st.checkbox(
+        "Applies to every client",
+        value=not client_name,
+        disabled=not client_name,
+    )
+
+    if st.form_submit_button("Record decision"):
+        kind = kind_of[label]
+        duplicate = kind == "duplicate"
+        with span("record_decision"):
+            store.record(
+                kind,
+                selected,
+                access_type="" if duplicate or access_type == "All" else access_type,
+                item="" if duplicate else item,
+                other_sg=other_sg if duplicate else "",
+                client="" if all_clients else client_name,
+                note=note,
+            )
+        st.success(f"✔ Recorded: {label}")
+
+with span("sg_decisions"):
+    recorded = store.decisions(sg=selected, client=client_name)
+
+if recorded.empty:
+    st.info("ℹ️ No decisions recorded for this security group.")
+else:
+    shown = pd.DataFrame({
+        "ID": recorded["id"],
+        "Decision": recorded["kind"].map(DECISION_KINDS),
+        "Client": recorded["client"].replace("", "All"),
+        "Access Type": recorded["access_type"].replace("", "All"),
+        "Item": recorded["item"].replace("", "All"),
+        "Duplicate of": [
+            o if s == selected else s for s, o in zip(recorded["sg"], recorded["other_sg"])
+        ],
+        "Note": recorded["note"],
+        "Recorded": recorded["decided_at"],
+    })
+    st.dataframe(shown, use_container_width=True, hide_index=True)
+
+    r1, r2 = st.columns([3, 1])
+    remove_id = r1.selectbox("Decision to remove", shown["ID"].tolist())
+    if r2.button("Remove", use_container_width=True):
+        store.remove(remove_id)
+        st.rerun()
+
+diagnostics_panel(recorder)
@@ -0,0 +1,71 @@
+import streamlit as st
+
+from utils.instrumentation import diagnostics_panel, session_recorder
+
+recorder = session_recorder(st.session_state)
+recorder.begin("Snapshot Drift")
+
+# ------------------------------------------------------------------------------
+# PAGE HEADER
+# ------------------------------------------------------------------------------
+st.markdown("""
+<h2 style="color:#2A61FF; margin-bottom:0;">🔄 Changed Since Last Upload</h2>
+<p style="color:#555; margin-top:4px; font-size:14px;">
+Security groups added, removed or modified compared with the previous upload
+of the same client. Only content changes count; item order and spacing are ignored.
+</p>
+<hr style="margin-top:0;">
+""", unsafe_allow_html=True)
+
+# ------------------------------------------------------------------------------
+# VALIDATION
+# ------------------------------------------------------------------------------
+if "client_df" not in st.session_state:
+    st.error("⚠️ Please upload a client file on the main page.")
+    st.stop()
+
+drift = st.session_state.get("drift")
+
+if drift is None:
+    st.info("ℹ️ No previous upload of this client to compare with. "
+            "Upload a revised export under the same client name to see what changed.")
+    st.stop()
+
+# ------------------------------------------------------------------------------
+# SUMMARY CARDS
+# ------------------------------------------------------------------------------
+counts = drift["Change"].value_counts()
+
+c1, c2, c3 = st.columns(3)
+
+for col, label, color in [
+    (c1, "Added", "#00A65A"),
+    (c2, "Removed", "#D62828"),
+    (c3, "Modified", "#FF8C00"),
+]:
+    col.markdown(f"""
+    <div style="padding:18px; background:#FFF; border-radius:10px;
+                box-shadow:0 2px 8px rgba(0,0,0,.08); border:1px solid #EEE;">
+        <h3 style="margin:0; font-size:20px; color:{color};">{label} Security Group(s)</h3>
+        <p style="font-size:28px; margin:0; font-weight:bold;">{int(counts.get(label, 0))}</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+st.markdown("---")
+
+# ------------------------------------------------------------------------------
+# CHANGE LIST
+# ------------------------------------------------------------------------------
+if drift.empty:
+    st.success("✔ No security groups changed since the last upload.")
+    st.stop()
+
+changes = st.multiselect("Change", ["Added", "Removed", "Modified"], default=[])
+
+view = drift if not changes else drift[drift["Change"].isin(changes)]
+view = view.reset_index(drop=True)
+view.insert(0, "S.No", range(1, len(view) + 1))
+
+st.dataframe(view, use_container_width=True, hide_index=True)
+
+diagnostics_panel(recorder)
@@ -0,0 +1,106 @@
+import streamlit as st
+
+from utils.instrumentation import diagnostics_panel, session_recorder, span
+from utils.search import PermissionIndex
+
+recorder = session_recorder(st.session_state)
+recorder.begin("Permission Search")
+
+# Rows shown per search; the match count always covers every match.
+MAX_RESULTS = 1000
+
+# ------------------------------------------------------------------------------
+# PAGE HEADER
+# ------------------------------------------------------------------------------
+st.markdown("""
+<h2 style="color:#2A61FF; margin-bottom:0;">🔑 Permission Search</h2>
+<p style="color:#555; margin-top:4px; font-size:14px;">
+Find which security groups grant a domain, task or business process, in the client
+tenant and in the industry standard, and through which access type.
+</p>
+<hr style="margin-top:0;">
+""", unsafe_allow_html=True)
+
+# ------------------------------------------------------------------------------
+# VALIDATION
+# ------------------------------------------------------------------------------
+if "client_df" not in st.session_state or "std_df" not in st.session_state:
+    st.error("⚠️ Please upload a client file on the main page.")
+    st.stop()
+
+client_df = st.session_state["client_df"]
+std_df = st.session_state["std_df"]
+
+# ------------------------------------------------------------------------------
+# INDEX (built once per upload)
+# ------------------------------------------------------------------------------
+if "permission_index" not in st.session_state:
+    with st.spinner("Indexing permissions..."), \
+            span("permission_index", rows=len(client_df) + len(std_df)):
+        st.session_state["permission_index"] = PermissionIndex({
+            "Client": client_df,
+            "Standard": std_df,
+        })
+
+index = st.session_state["permission_index"]
+
+# ------------------------------------------------------------------------------
+# SEARCH
+# ------------------------------------------------------------------------------
+s1, s2, s3 = st.columns([3, 1, 2])
+
+query = s1.text_input(
+    "Permission",
+    "",
+    placeholder="e.g. Worker Data: Public Worker Reports",
+)
+mode = s2.radio("Match", ["Contains", "Starts with"], horizontal=False)
+sources = s3.multiselect("Source", index.sources, default=index.sources)
+
+if not query.strip():
+    st.info(f"ℹ️ Type part of a permission name to search {len(index.item_ids)} distinct permissions.")
+    diagnostics_panel(recorder)
+    st.stop()
+
+if not sources:
+    st.warning("Select at least one source.")
+    diagnostics_panel(recorder)
+    st.stop()
+
+with span("permission_search") as stage:
+    results, n_permissions, n_matches = index.search(
+        query,
+        mode="prefix" if mode == "Starts with" else "substring",
+        sources=sources,
+        limit=MAX_RESULTS,
+    )
+    stage["rows"] = n_matches
+
+# ------------------------------------------------------------------------------
+# RESULTS
+# ------------------------------------------------------------------------------
+if results.empty:
+    st.info("No security group grants a matching permission.")
+    diagnostics_panel(recorder)
+    st.stop()
+
+shown = (
+    f"showing the first {len(results)}" if n_matches > len(results) else "showing all"
+)
+st.markdown(
+    f"**{n_matches}** grant(s) of **{n_permissions}** matching permission(s) — {shown}."
+)
+
+counts = (
+    results.groupby("Source", observed=True)["Security Group"].nunique()
+    if n_matches == len(results) else None
+)
+if counts is not None:
+    cols = st.columns(len(counts))
+    for col, (source, n) in zip(cols, counts.items()):
+        col.metric(f"{source} security groups", int(n))
+
+results.insert(0, "S.No", range(1, len(results) + 1))
+st.dataframe(results, use_container_width=True, hide_index=True)
+
+diagnostics_panel(recorder)
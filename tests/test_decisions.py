@@ -0,0 +1,15 @@
+from utils.decisions import DecisionStore
+
+
+def test_changes_move_the_revision(tmp_path):
+    store = DecisionStore(str(tmp_path / "decisions.db"))
+    start = store.revision
+
+    decision_id = store.record("accepted_risk", "HR Partner", "View Access", "Payroll Report")
+    assert store.revision == start + 1
+
+    store.decisions()
+    assert store.revision == start + 1
+
+    store.remove(decision_id)
+    assert store.revision == start + 2
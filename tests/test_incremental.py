@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+import utils.vocabulary as vocabulary
+from benchmarks.tenant import generate_tenant
+from utils.comparator import compare_frames
+from utils.helpers import normalize_dataframe
+from utils.incremental import incremental_update, make_snapshot, sg_digests
+from utils.similarity import similarity_pairs
+from utils.vocabulary import encoded
+
+
+def _tenant(n_sgs=300, seed=4):
+    std_raw, client_raw = generate_tenant(n_sgs=n_sgs, seed=seed)
+    return normalize_dataframe(std_raw), normalize_dataframe(client_raw)
+
+
+def _snapshot(std_df, client_df):
+    pairs = similarity_pairs(client_df)
+    return make_snapshot(
+        "before", "baseline", sg_digests(client_df),
+        compare_frames(std_df, client_df), pairs.frame(0.90), None, pairs,
+    )
+
+
+def test_small_update_does_not_reencode_the_baseline(monkeypatch):
+    std_df, client_df = _tenant()
+    snapshot = _snapshot(std_df, client_df)
+
+    revised = client_df.astype(object)
+    revised.iloc[7, 1] = "Brand New Report"
+    encoded(std_df)
+    encoded(revised)
+
+    tokenized = []
+    real = vocabulary.encode_frame
+
+    def counting(df, vocab=None):
+        tokenized.append(len(df))
+        return real(df, vocab)
+
+    monkeypatch.setattr(vocabulary, "encode_frame", counting)
+    diff_results, _, _, drift, _ = incremental_update(std_df, revised, snapshot)
+
+    assert tokenized == []
+    assert list(drift["Change"]) == ["Modified"]
+    full = compare_frames(std_df, revised)
+    pd.testing.assert_frame_equal(
+        diff_results["diff_table"].astype(object), full["diff_table"].astype(object)
+    )
+
+
+def test_merged_similarity_pairs_match_a_full_pass():
+    std_df, client_df = _tenant()
+    snapshot = _snapshot(std_df, client_df)
+
+    # one SG becomes a copy of another, one is dropped and one added
+    revised = client_df.astype(object)
+    revised.iloc[7, 1:] = revised.iloc[3, 1:]
+    added = revised.iloc[[11]].assign(**{"SG Name": "Added SG"})
+    revised = pd.concat([revised.drop(index=revised.index[20]), added], ignore_index=True)
+
+    _, similarity_results, pairs, _, _ = incremental_update(std_df, revised, snapshot)
+
+    full = similarity_pairs(revised)
+    np.testing.assert_array_equal(pairs.left, full.left)
+    np.testing.assert_array_equal(pairs.right, full.right)
+    np.testing.assert_allclose(pairs.sim, full.sim)
+    pd.testing.assert_frame_equal(similarity_results, full.frame(0.90))
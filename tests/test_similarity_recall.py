@@ -0,0 +1,15 @@
+import pytest
+
+from benchmarks.run import lsh_recall
+from benchmarks.tenant import generate_tenant
+from utils.helpers import normalize_dataframe
+from utils.similarity import MINHASH_RECALL_TARGET
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_minhash_recall_meets_target_at_default_threshold(seed):
+    _, client_raw = generate_tenant(n_sgs=500, near_duplicate_rate=0.2, seed=seed)
+    result = lsh_recall(normalize_dataframe(client_raw))
+
+    assert result["exact_pairs"] > 0
+    assert result["recall"] >= MINHASH_RECALL_TARGET
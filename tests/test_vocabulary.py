@@ -0,0 +1,30 @@
+import numpy as np
+
+from benchmarks.tenant import generate_tenant
+from utils.helpers import normalize_dataframe
+from utils.vocabulary import ItemTranslation, ItemVocabulary, encode_frame
+
+
+def test_translation_matches_a_shared_vocabulary():
+    std_raw, client_raw = generate_tenant(n_sgs=300, seed=3)
+    std_df, client_df = normalize_dataframe(std_raw), normalize_dataframe(client_raw)
+    rows = np.arange(min(len(std_df), len(client_df)))
+
+    std_enc, client_enc = encode_frame(std_df), encode_frame(client_df)
+    items = ItemTranslation(std_enc.vocab, client_enc.vocab)
+
+    shared = ItemVocabulary()
+    std_shared, client_shared = encode_frame(std_df, shared), encode_frame(client_df, shared)
+
+    expected = std_shared.cells[rows] != client_shared.cells[rows]
+    assert expected.any() and not expected.all()
+    np.testing.assert_array_equal(
+        items.differs(std_enc.cells[rows], client_enc.cells[rows]), expected
+    )
+
+    for std_cell, client_cell in zip(std_enc.cells[rows][expected], client_enc.cells[rows][expected]):
+        missing, extra = items.cell_difference(std_cell, client_cell)
+        texts = sorted(items.text(i) for i in np.concatenate([missing, extra]))
+        std_items = set(std_enc.vocab.decode(std_enc.vocab.cells[std_cell]))
+        client_items = set(client_enc.vocab.decode(client_enc.vocab.cells[client_cell]))
+        assert texts == sorted(std_items ^ client_items)
@@ -0,0 +1,37 @@
+import os
+
+import pandas as pd
+
+# Standard baselines, by display name. The first registered baseline is the
+# primary one: it drives similarity, SG detail and snapshot drift.
+STANDARD_BASELINES = {
+    "Standard": "standard_data.xlsx",
+    "Standard 1": "standard_data1.xlsx",
+}
+
+
+def available_baselines(registry: dict = None) -> dict:
+    """
+    Registered baselines whose workbook exists, in registration order.
+    """
+    registry = STANDARD_BASELINES if registry is None else registry
+    return {name: path for name, path in registry.items() if os.path.exists(path)}
+
+
+def baseline_overview(results: dict) -> pd.DataFrame:
+    """
+    Side-by-side counts for each baseline's comparison results
+    (baseline name -> compare_frames dict), one column per baseline.
+    """
+    rows = {
+        "Missing Security Group(s)": [len(r["only_in_std"]) for r in results.values()],
+        "Custom Security Group(s)": [len(r["only_in_client"]) for r in results.values()],
+        "Security Group - Differences Found": [len(r["diff_table"]) for r in results.values()],
+        "Missing Permissions": [
+            int((r["diff_items"]["Difference"] == "Missing").sum()) for r in results.values()
+        ],
+        "Extra Permissions": [
+            int((r["diff_items"]["Difference"] == "Extra").sum()) for r in results.values()
+        ],
+    }
+    return pd.DataFrame.from_dict(rows, orient="index", columns=list(results)).rename_axis("Metric")
@@ -0,0 +1,201 @@
+import hashlib
+import os
+import pickle
+import re
+import threading
+
+import pandas as pd
+
+from utils.ingest import read_export
+
+CACHE_DIR = ".cache"
+
+# Upper bound for the on-disk analysis result cache; least recently used
+# entries are evicted beyond it.
+RESULT_CACHE_BYTES = 1 << 30
+
+# Bump when the shape of cached analysis results changes.
+RESULT_VERSION = 8
+
+# Bump when the ingestion of standard workbooks changes.
+SNAPSHOT_VERSION = 4
+
+_RESULTS_LOCK = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """
+    SHA-256 of a file's bytes (hex).
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def bytes_digest(data: bytes) -> str:
+    """
+    SHA-256 of an in-memory payload (hex), e.g. an uploaded file.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def result_key(client_digest: str, baseline_digest: str) -> str:
+    """
+    Cache key for an analysis: the client file's content hash combined
+    with the standard baseline's content hash.
+    """
+    raw = f"{RESULT_VERSION}:{client_digest}:{baseline_digest}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _snapshot_path(path: str, digest: str, cache_dir: str) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{stem}-v{SNAPSHOT_VERSION}-{digest[:16]}.parquet")
+
+
+def load_standard(path: str, digest: str = None, cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """
+    Load and normalize a standard workbook through a parquet snapshot
+    keyed on the workbook's content hash.
+
+    The snapshot is written on first load; later loads (including after
+    a restart) read it directly. Editing the workbook changes its hash,
+    so the stale snapshot is ignored and replaced.
+    """
+    digest = digest or file_digest(path)
+    snapshot = _snapshot_path(path, digest, cache_dir)
+
+    if os.path.exists(snapshot):
+        try:
+            return pd.read_parquet(snapshot)
+        except Exception:
+            # unreadable snapshot (partial write, format change): rebuild it
+            pass
+
+    df = read_export(path)
+
+    tmp = f"{snapshot}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, snapshot)
+        _prune_snapshots(path, snapshot, cache_dir)
+    except Exception:
+        # read-only deployments or unsupported cell types: serve the
+        # parsed frame, just without a snapshot
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    return df
+
+
+def _prune_snapshots(path: str, keep: str, cache_dir: str):
+    """
+    Remove snapshots of earlier versions of the same workbook.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    pattern = re.compile(rf"{re.escape(stem)}-(v\d+-)?[0-9a-f]{{16}}\.parquet")
+    for name in os.listdir(cache_dir):
+        full = os.path.join(cache_dir, name)
+        if pattern.fullmatch(name) and full != keep:
+            os.remove(full)
+
+
+def _results_dir(cache_dir: str) -> str:
+    return os.path.join(cache_dir, "results")
+
+
+def get_results(key: str, cache_dir: str = CACHE_DIR):
+    """
+    Cached analysis results for a key, or None.
+    A hit refreshes the entry's position in the LRU order.
+    """
+    path = os.path.join(_results_dir(cache_dir), f"{key}.pkl")
+    try:
+        with open(path, "rb") as f:
+            results = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # corrupt or incompatible entry: drop it and recompute
+        with _RESULTS_LOCK:
+            if os.path.exists(path):
+                os.remove(path)
+        return None
+
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return results
+
+
+def put_results(
+    key: str,
+    results: dict,
+    cache_dir: str = CACHE_DIR,
+    max_bytes: int = RESULT_CACHE_BYTES,
+):
+    """
+    Store analysis results under a key, then evict least recently used
+    entries until the cache fits in max_bytes.
+    """
+    directory = _results_dir(cache_dir)
+    path = os.path.join(directory, f"{key}.pkl")
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(tmp, "wb") as f:
+            pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except Exception:
+        # caching is best-effort; the caller still has its results
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return
+
+    with _RESULTS_LOCK:
+        evict_lru(directory, max_bytes)
+
+
+def update_results(key: str, cache_dir: str = CACHE_DIR, **fields) -> bool:
+    """
+    Add or replace fields of cached analysis results, e.g. similarity
+    pairs computed after the entry was written. False when there is no
+    entry for the key.
+    """
+    results = get_results(key, cache_dir)
+    if results is None:
+        return False
+    results.update(fields)
+    put_results(key, results, cache_dir)
+    return True
+
+
+def evict_lru(directory: str, max_bytes: int, suffix: str = ".pkl"):
+    """
+    Remove the least recently used `suffix` files of a cache directory
+    until the rest fit in max_bytes.
+    """
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith(suffix):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from utils.similarity import SimilarityPairs
+from utils.vocabulary import encoded
+
+
+def _compress(parent: np.ndarray) -> np.ndarray:
+    """
+    Point every node straight at its root (pointer jumping).
+    """
+    while True:
+        grand = parent[parent]
+        if np.array_equal(grand, parent):
+            return parent
+        parent = grand
+
+
+def connected_components(n: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """
+    Component label of each of n nodes given undirected edges, as the
+    smallest node index in its component.
+
+    Union-find run over all edges at once: each round hooks the larger
+    root of every edge that still spans two components onto the smaller
+    one, then compresses paths. Every round is a few array passes over
+    the edges, so millions of pairs take a handful of vectorized rounds
+    rather than a Python loop per pair.
+    """
+    parent = np.arange(n, dtype=np.int64)
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+
+    while True:
+        a, b = parent[left], parent[right]
+        spans = a != b
+        if not spans.any():
+            return parent
+        a, b = a[spans], b[spans]
+        # roots only ever hook onto smaller roots, so no cycles form
+        np.minimum.at(parent, np.maximum(a, b), np.minimum(a, b))
+        parent = _compress(parent)
+        # edges already inside one component never span two again
+        left, right = left[spans], right[spans]
+
+
+class DuplicateClusters:
+    """
+    Groups of near-duplicate SGs: connected components of the similarity
+    graph with an edge for every pair at or above `threshold` (single
+    linkage, so members of large clusters may be linked only through
+    others; "Lowest Similarity" shows the weakest link used).
+
+    Each cluster gets a suggested canonical SG, the member with the
+    highest summed similarity to the others (ties by name), and the
+    permission items not held by every member. Clusters are ordered by
+    size, largest first.
+    """
+
+    def __init__(self, df: pd.DataFrame, pairs: SimilarityPairs, threshold: float = 0.90):
+        self.pairs = pairs
+        self.threshold = threshold
+        enc = encoded(df)
+        self.vocab = enc.vocab
+        names = np.asarray(pairs.sg_names, dtype=object)
+
+        n = pairs.count(threshold)
+        left, right, sim = pairs.left[:n], pairs.right[:n], pairs.sim[:n]
+
+        labels = connected_components(len(names), left, right)
+        nodes = np.unique(np.concatenate([left, right])).astype(np.int64)
+        roots, node_cluster = np.unique(labels[nodes], return_inverse=True)
+        node_cluster = node_cluster.ravel()
+        n_clusters = len(roots)
+
+        weight = (
+            np.bincount(left, weights=sim, minlength=len(names))
+            + np.bincount(right, weights=sim, minlength=len(names))
+        )[nodes]
+        name_rank = np.empty(len(nodes), dtype=np.int64)
+        name_rank[np.argsort(names[nodes].astype(str), kind="stable")] = np.arange(len(nodes))
+
+        # members grouped by cluster, canonical (heaviest) first, then by name
+        order = np.lexsort((name_rank, -weight, node_cluster))
+        sizes = np.bincount(node_cluster, minlength=n_clusters)
+        starts = np.concatenate([[0], np.cumsum(sizes)])
+        canonical = nodes[order[starts[:-1]]]
+
+        cluster_of = np.full(len(names), -1, dtype=np.int64)
+        cluster_of[nodes] = node_cluster
+        lowest = np.full(n_clusters, np.inf)
+        np.minimum.at(lowest, cluster_of[left], sim)
+
+        # item counts per cluster: cluster x node indicator @ node x item
+        matrix = enc.item_matrix()[nodes]
+        indicator = sparse.csr_matrix(
+            (np.ones(len(nodes), dtype=np.int32), (node_cluster, np.arange(len(nodes)))),
+            shape=(n_clusters, len(nodes)),
+        )
+        counts = (indicator @ matrix).tocsr()
+        count_rows = np.repeat(np.arange(n_clusters), np.diff(counts.indptr))
+        differing = np.bincount(
+            count_rows[counts.data < sizes[count_rows]], minlength=n_clusters
+        )
+
+        # largest clusters first, ties by canonical name
+        rank = np.lexsort((names[canonical].astype(str), -sizes))
+        self._names = names
+        self._nodes = nodes
+        self._order = order
+        self._starts = starts
+        self._rank = rank
+        self._matrix = matrix
+        self.sizes = sizes[rank]
+        self.canonical = names[canonical[rank]]
+        self.lowest = lowest[rank]
+        self.differing = differing[rank]
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def members(self, cluster: int) -> np.ndarray:
+        """
+        Encoded row ids of a cluster's SGs, canonical first.
+        """
+        k = self._rank[cluster]
+        return self._nodes[self._order[self._starts[k]:self._starts[k + 1]]]
+
+    def table(self) -> pd.DataFrame:
+        """
+        One row per cluster: size, canonical SG, members and how many
+        permission items differ within it.
+        """
+        return pd.DataFrame({
+            "Cluster": np.arange(1, len(self) + 1),
+            "Size": self.sizes.astype(np.int64),
+            "Canonical SG": self.canonical,
+            "Members": ["\n".join(self._names[self.members(c)]) for c in range(len(self))],
+            "Lowest Similarity": [round(float(s) * 100, 2) for s in self.lowest],
+            "Differing Permissions": self.differing.astype(np.int64),
+        })
+
+    def differences(self, cluster: int) -> pd.DataFrame:
+        """
+        Permission items of one cluster not held by every member: how many
+        members hold each, whether the canonical SG does, and the members
+        without it. Items the canonical SG lacks come first.
+        """
+        members = self.members(cluster)
+        # nodes are sorted, so a member's matrix row is found by bisection
+        rows = self._matrix[np.searchsorted(self._nodes, members)]
+        held = np.asarray(rows.sum(axis=0)).ravel()
+        items = np.flatnonzero((held > 0) & (held < len(members)))
+        columns = ["Permission", "Held By", "In Canonical", "Members Without"]
+        if not len(items):
+            return pd.DataFrame(columns=columns)
+
+        has = rows[:, items].toarray().astype(bool)
+        names = self._names[members]
+        texts = np.asarray([self.vocab.items[i] for i in items], dtype=object)
+        order = np.lexsort((texts.astype(str), -held[items], has[0]))
+        return pd.DataFrame({
+            "Permission": texts[order],
+            "Held By": [f"{held[items[k]]} of {len(members)}" for k in order],
+            "In Canonical": np.where(has[0, order], "Yes", "No"),
+            "Members Without": ["\n".join(names[~has[:, k]]) for k in order],
+        })
@@ -1,11 +1,167 @@
+import numpy as np
 import pandas as pd
 
-def compute_differences(std_df: pd.DataFrame, client_df: pd.DataFrame):
+from utils.helpers import compact_text_columns
+from utils.vocabulary import ItemTranslation, encoded
+
+
+def _cell_text(values: np.ndarray) -> np.ndarray:
     """
-    Computes:
-      - SGs missing in client
-      - SGs only in client
-      - Detailed differences per column
+    Raw cell values as display strings, with blanks for missing values.
+    """
+    return np.array(
+        ["" if pd.isna(v) else str(v) for v in values], dtype=object
+    )
+
+
+DIFFERENCE_KINDS = ["Missing", "Extra"]
+
+
+def _difference_items(items, sg_names, columns, column_order, std_cells, client_cells) -> pd.DataFrame:
+    """
+    Long-format item differences for the differing cells:
+    one row per (SG, access type, item) with its kind, Missing or Extra.
+
+    "Diff Row" points back into diff_table. Rows are ordered by diff row,
+    then Missing before Extra, then item text.
+    """
+    pairs = np.stack([std_cells, client_cells], axis=1).reshape(-1, 2)
+    # identical (standard cell, client cell) pairs are diffed only once
+    unique_pairs, pair_of_row = np.unique(pairs, axis=0, return_inverse=True)
+    pair_of_row = pair_of_row.ravel()
+
+    pair_ids, pair_kinds = [], []
+    for std_cell, client_cell in unique_pairs:
+        missing, extra = items.cell_difference(std_cell, client_cell)
+        pair_ids.append(np.concatenate([missing, extra]).astype(np.int32))
+        pair_kinds.append(np.repeat(np.int8([0, 1]), [len(missing), len(extra)]))
+
+    pair_lengths = np.array([len(ids) for ids in pair_ids], dtype=np.int64)
+    diff_row = np.repeat(
+        np.arange(len(pair_of_row), dtype=np.int32), pair_lengths[pair_of_row]
+    )
+    item_ids = _concat([pair_ids[k] for k in pair_of_row], np.int32)
+    kinds = _concat([pair_kinds[k] for k in pair_of_row], np.int8)
+
+    # item categories in alphabetical order, so codes sort like the text
+    used = np.unique(item_ids)
+    texts = np.asarray([items.text(i) for i in used], dtype=object)
+    alpha = np.argsort(texts, kind="stable")
+    rank = np.empty(len(used), dtype=np.int32)
+    rank[alpha] = np.arange(len(used), dtype=np.int32)
+    item_codes = rank[np.searchsorted(used, item_ids)]
+
+    order = np.lexsort((item_codes, kinds, diff_row))
+    diff_row, kinds, item_codes = diff_row[order], kinds[order], item_codes[order]
+
+    return pd.DataFrame({
+        "Diff Row": diff_row,
+        "SG Name": pd.Categorical(sg_names[diff_row]),
+        "Column": pd.Categorical(columns[diff_row], categories=column_order),
+        "Item": pd.Categorical.from_codes(item_codes, categories=texts[alpha]),
+        "Difference": pd.Categorical.from_codes(kinds, categories=DIFFERENCE_KINDS),
+    })
+
+
+def _concat(parts, dtype):
+    return np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+
+
+class DiffCube:
+    """
+    Missing/Extra item counts per SG x access type, aggregated from
+    diff_items in one bincount pass. counts[sg, column, kind] follows
+    sg_names, columns and DIFFERENCE_KINDS. Rankings, heatmaps and per-SG
+    totals are read off this cube instead of rescanning the differences.
+    """
+
+    def __init__(self, sg_names, columns, counts: np.ndarray):
+        self.sg_names = np.asarray(sg_names, dtype=object)
+        self.columns = list(columns)
+        self.counts = counts
+        self.row_of = {sg: k for k, sg in enumerate(self.sg_names)}
+
+    @classmethod
+    def from_items(cls, diff_items: pd.DataFrame) -> "DiffCube":
+        sgs = diff_items["SG Name"].cat
+        columns = diff_items["Column"].cat
+        n_sgs, n_columns = len(sgs.categories), len(columns.categories)
+
+        cell = (
+            (sgs.codes.to_numpy(dtype=np.int64) * n_columns + columns.codes.to_numpy()) * 2
+            + diff_items["Difference"].cat.codes.to_numpy()
+        )
+        counts = np.bincount(cell, minlength=n_sgs * n_columns * 2)
+        return cls(
+            sgs.categories.to_numpy(dtype=object),
+            columns.categories,
+            counts.reshape(n_sgs, n_columns, 2).astype(np.int32),
+        )
+
+    def sg_totals(self) -> pd.DataFrame:
+        """
+        Missing, Extra and total item differences per SG, largest total
+        first (ties by SG name).
+        """
+        per_kind = self.counts.sum(axis=1)
+        total = per_kind.sum(axis=1)
+        keep = np.flatnonzero(total)
+        order = keep[np.argsort(-total[keep], kind="stable")]
+        return pd.DataFrame({
+            "Security Group": self.sg_names[order],
+            "Missing": per_kind[order, 0].astype(np.int64),
+            "Extra": per_kind[order, 1].astype(np.int64),
+            "Total Differences": total[order].astype(np.int64),
+        })
+
+    def by_access_type(self, sgs=None, kind: str = None) -> pd.DataFrame:
+        """
+        SG x access type counts (Missing, Extra or, by default, both) for
+        the given SGs (all by default).
+        """
+        if kind is None:
+            values = self.counts.sum(axis=2)
+        else:
+            values = self.counts[:, :, DIFFERENCE_KINDS.index(kind)]
+        if sgs is None:
+            sgs = self.sg_names
+        rows = np.array([self.row_of[sg] for sg in sgs], dtype=np.int64)
+        return pd.DataFrame(
+            values[rows].astype(np.int64),
+            index=pd.Index(list(sgs), name="Security Group"),
+            columns=pd.Index(self.columns, name="Access Type"),
+        )
+
+    def sg_breakdown(self, sg) -> pd.DataFrame:
+        """
+        Missing/Extra counts of one SG per access type that differs.
+        """
+        row = self.row_of.get(sg)
+        if row is None:
+            return pd.DataFrame(columns=["Access Type", "Missing", "Extra", "Total"])
+        counts = self.counts[row].astype(np.int64)
+        keep = np.flatnonzero(counts.sum(axis=1))
+        return pd.DataFrame({
+            "Access Type": np.asarray(self.columns, dtype=object)[keep],
+            "Missing": counts[keep, 0],
+            "Extra": counts[keep, 1],
+            "Total": counts[keep].sum(axis=1),
+        })
+
+
+def compare_frames(std_df: pd.DataFrame, client_df: pd.DataFrame) -> dict:
+    """
+    Computes, in one pass:
+      - only_in_std: SGs missing in client
+      - only_in_client: SGs only in client
+      - diff_table: differing cells (SG Name, Column, Standard/Client Value)
+      - diff_items: long-format item differences (SG Name, Column, Item,
+        Difference = Missing/Extra, Diff Row), categorical dtypes
+      - diff_cube: DiffCube of Missing/Extra counts per SG x access type
+
+    Both frames are aligned on SG Name once (first occurrence wins) and
+    compared through their tokenized cell ids, so a cell only differs when
+    its set of permission items differs.
     """
 
     std_set = set(std_df["SG Name"])
@@ -15,28 +171,74 @@ def compute_differences(std_df: pd.DataFrame, client_df: pd.DataFrame):
     only_in_client = sorted(list(client_set - std_set))
 
     # Row-level detailed diff
-    diff_rows = []
-    common = std_set.intersection(client_set)
+    std_enc = encoded(std_df)
+    client_enc = encoded(client_df)
+    # each frame keeps its own vocabulary; cells are compared by item set
+    items = ItemTranslation(std_enc.vocab, client_enc.vocab)
+
+    columns = std_enc.columns
+    common = sorted(std_set.intersection(client_set))
+    std_rows = np.array([std_enc.row_of[sg] for sg in common], dtype=np.int64)
+    client_rows = np.array([client_enc.row_of[sg] for sg in common], dtype=np.int64)
+
+    std_cells = std_enc.column_cells(columns)[std_rows]
+    client_cells = client_enc.column_cells(columns)[client_rows]
+
+    row_idx, col_idx = np.nonzero(items.differs(std_cells, client_cells))
 
-    for sg in common:
-        std_row = std_df[std_df["SG Name"] == sg].iloc[0]
-        client_row = client_df[client_df["SG Name"] == sg].iloc[0]
+    std_text = std_df[columns].to_numpy(dtype=object)[std_rows[row_idx], col_idx]
+    client_text = (
+        client_df.reindex(columns=columns)
+        .to_numpy(dtype=object)[client_rows[row_idx], col_idx]
+    )
 
-        for col in std_df.columns:
-            if col == "SG Name":
-                continue
+    diff_sgs = np.asarray(common, dtype=object)[row_idx]
+    diff_columns = np.asarray(columns, dtype=object)[col_idx]
 
-            std_val = "" if pd.isna(std_row[col]) else str(std_row[col])
-            client_val = "" if pd.isna(client_row[col]) else str(client_row[col])
+    diff_table = compact_text_columns(pd.DataFrame({
+        "SG Name": pd.Categorical(diff_sgs),
+        "Column": pd.Categorical(diff_columns, categories=columns),
+        "Standard Value": _cell_text(std_text),
+        "Client Value": _cell_text(client_text),
+    }), ["Standard Value", "Client Value"])
 
-            if std_val != client_val:
-                diff_rows.append({
-                    "SG Name": sg,
-                    "Column": col,
-                    "Standard Value": std_val,
-                    "Client Value": client_val
-                })
+    diff_items = _difference_items(
+        items,
+        diff_sgs,
+        diff_columns,
+        columns,
+        std_cells[row_idx, col_idx],
+        client_cells[row_idx, col_idx],
+    )
 
-    diff_table = pd.DataFrame(diff_rows)
+    return {
+        "only_in_std": only_in_std,
+        "only_in_client": only_in_client,
+        "diff_table": diff_table,
+        "diff_items": diff_items,
+        "diff_cube": DiffCube.from_items(diff_items),
+    }
 
-    return only_in_std, only_in_client, diff_table
+
+def compare_baselines(baselines: dict, client_df: pd.DataFrame) -> dict:
+    """
+    compare_frames against several standard baselines (name -> frame),
+    keyed like `baselines`. The client is tokenized and indexed once and
+    that encoding is reused for every baseline.
+    """
+    encoded(client_df)
+    return {
+        name: compare_frames(std_df, client_df)
+        for name, std_df in baselines.items()
+    }
+
+
+def compute_differences(std_df: pd.DataFrame, client_df: pd.DataFrame):
+    """
+    Computes:
+      - SGs missing in client
+      - SGs only in client
+      - Detailed differences per column
+    """
+    results = compare_frames(std_df, client_df)
+    return results["only_in_std"], results["only_in_client"], results["diff_table"]
@@ -0,0 +1,369 @@
+"""
+Embedded SQLite store for analyst decisions on diff and similarity results:
+
+  - accepted_risk: a Missing/Extra difference the client accepts
+  - update: a difference to be fixed in Workday
+  - duplicate: an SG pair reviewed as duplicates
+
+A decision targets an SG, optionally narrowed to an access type and an
+item (an empty access type / item covers all of them), and belongs to one
+client or, with an empty client, to every client. Rows are indexed by
+(sg, access_type, item) and by (sg, other_sg) so results are annotated
+through indexed lookups rather than spreadsheet scans.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+DECISIONS_DB = "decisions.db"
+
+# Spreadsheets the store replaces, imported once on first use.
+LEGACY_SPREADSHEETS = {
+    "accepted_risk": "accepted_risk.xlsx",
+    "update": "update_workday.xlsx",
+    "duplicate": "duplicate_sg_analysis.xlsx",
+}
+
+DECISION_KINDS = {
+    "accepted_risk": "Accepted Risk",
+    "update": "Update Workday",
+    "duplicate": "Duplicate SG",
+}
+
+# Header aliases recognized by the spreadsheet importer (case-insensitive).
+_ALIASES = {
+    "sg": ["security group", "sg name", "sg", "sg 1"],
+    "other_sg": ["sg 2", "duplicate of", "duplicate sg", "other security group"],
+    "access_type": ["access type", "column"],
+    "item": ["item", "permission", "difference item", "domain"],
+    "note": ["note", "notes", "comment", "comments", "reason", "decision", "justification"],
+    "decided_by": ["decided by", "owner", "approved by", "reviewer"],
+    "client": ["client", "tenant"],
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL CHECK (kind IN ('accepted_risk', 'update', 'duplicate')),
+    client TEXT NOT NULL DEFAULT '',
+    sg TEXT NOT NULL,
+    access_type TEXT NOT NULL DEFAULT '',
+    item TEXT NOT NULL DEFAULT '',
+    other_sg TEXT NOT NULL DEFAULT '',
+    note TEXT NOT NULL DEFAULT '',
+    decided_by TEXT NOT NULL DEFAULT '',
+    decided_at TEXT NOT NULL,
+    UNIQUE (kind, client, sg, access_type, item, other_sg)
+);
+CREATE INDEX IF NOT EXISTS ix_decisions_item ON decisions (sg, access_type, item);
+CREATE INDEX IF NOT EXISTS ix_decisions_pair ON decisions (sg, other_sg);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    rows INTEGER NOT NULL,
+    imported_at TEXT NOT NULL
+);
+"""
+
+_COLUMNS = [
+    "id", "kind", "client", "sg", "access_type", "item",
+    "other_sg", "note", "decided_by", "decided_at",
+]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _text(value) -> str:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return str(value).strip()
+
+
+class DecisionStore:
+    """
+    Decisions kept in one SQLite file. Each call opens its own short-lived
+    connection, so a store may be shared across sessions and threads.
+
+    `revision` goes up with every change made through the store, so
+    annotations computed from it can be cached until it moves.
+    """
+
+    def __init__(self, path: str = DECISIONS_DB):
+        self.path = path
+        self.revision = 0
+        self._revision_lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _changed(self):
+        with self._revision_lock:
+            self.revision += 1
+
+    # --------------------------------------------------------------------
+    # Writing
+    # --------------------------------------------------------------------
+    def record(self, kind: str, sg: str, access_type: str = "", item: str = "",
+               other_sg: str = "", client: str = "", note: str = "", decided_by: str = "") -> int:
+        """
+        Insert or update one decision; returns its id.
+        """
+        if kind not in DECISION_KINDS:
+            raise ValueError(f"Unknown decision kind: {kind!r}")
+        if kind == "duplicate" and other_sg and other_sg < sg:
+            sg, other_sg = other_sg, sg
+
+        row = (kind, _text(client), _text(sg), _text(access_type), _text(item),
+               _text(other_sg), _text(note), _text(decided_by), _now())
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """
+                INSERT INTO decisions
+                    (kind, client, sg, access_type, item, other_sg, note, decided_by, decided_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (kind, client, sg, access_type, item, other_sg)
+                DO UPDATE SET note = excluded.note,
+                              decided_by = excluded.decided_by,
+                              decided_at = excluded.decided_at
+                """,
+                row,
+            )
+            decision_id = conn.execute(
+                """
+                SELECT id FROM decisions
+                WHERE kind = ? AND client = ? AND sg = ? AND access_type = ?
+                  AND item = ? AND other_sg = ?
+                """,
+                row[:6],
+            ).fetchone()[0]
+        self._changed()
+        return decision_id
+
+    def remove(self, decision_id: int):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM decisions WHERE id = ?", (int(decision_id),))
+        self._changed()
+
+    # --------------------------------------------------------------------
+    # Reading
+    # --------------------------------------------------------------------
+    def decisions(self, kind: str = None, sg: str = None, client: str = None) -> pd.DataFrame:
+        """
+        Stored decisions, optionally for one kind, one SG (either side of
+        a duplicate pair) and one client (including all-client decisions).
+        """
+        where, params = [], []
+        if kind is not None:
+            where.append("kind = ?")
+            params.append(kind)
+        if sg is not None:
+            where.append("(sg = ? OR other_sg = ?)")
+            params += [sg, sg]
+        if client is not None:
+            where.append("client IN (?, '')")
+            params.append(client)
+
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM decisions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY sg, access_type, item, other_sg"
+
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def _decisions_for_sgs(self, sgs, kinds, client: str, column: str = "sg") -> pd.DataFrame:
+        """
+        Decisions of the given kinds whose `column` is one of `sgs`, found
+        through the SG index via a temporary join table.
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("CREATE TEMP TABLE wanted_sgs (sg TEXT PRIMARY KEY)")
+            conn.executemany(
+                "INSERT OR IGNORE INTO wanted_sgs VALUES (?)", ((str(s),) for s in sgs)
+            )
+            marks = ", ".join("?" for _ in kinds)
+            return pd.read_sql_query(
+                f"""
+                SELECT d.kind, d.sg, d.access_type, d.item, d.other_sg, d.note
+                FROM wanted_sgs w
+                JOIN decisions d ON d.{column} = w.sg
+                WHERE d.kind IN ({marks}) AND d.client IN (?, '')
+                """,
+                conn,
+                params=[*kinds, client or ""],
+            )
+
+    # --------------------------------------------------------------------
+    # Annotation
+    # --------------------------------------------------------------------
+    def annotate_items(self, diff_items: pd.DataFrame, client: str = "") -> pd.DataFrame:
+        """
+        Decision and note for each row of diff_items (long format), as a
+        frame aligned with it. Narrower decisions win over broader ones
+        (item over access type over whole SG), and accepted risk wins over
+        update at the same level.
+        """
+        decision = np.full(len(diff_items), "", dtype=object)
+        note = np.full(len(diff_items), "", dtype=object)
+
+        sg = diff_items["SG Name"].astype(object).to_numpy()
+        found = self._decisions_for_sgs(set(sg), ["accepted_risk", "update"], client)
+
+        if not found.empty:
+            column = diff_items["Column"].astype(object).to_numpy()
+            item = diff_items["Item"].astype(object).to_numpy()
+            blank = np.full(len(sg), "", dtype=object)
+
+            found["by_access"] = found["access_type"] != ""
+            found["by_item"] = found["item"] != ""
+            found["accepted"] = found["kind"] == "accepted_risk"
+
+            # broad to narrow, so narrower decisions overwrite broader ones
+            for by_access, by_item in [(False, False), (False, True), (True, False), (True, True)]:
+                level = found[(found["by_access"] == by_access) & (found["by_item"] == by_item)]
+                if level.empty:
+                    continue
+                level = (
+                    level.sort_values("accepted", kind="stable")
+                    .drop_duplicates(["sg", "access_type", "item"], keep="last")
+                )
+                hit = pd.MultiIndex.from_frame(level[["sg", "access_type", "item"]]).get_indexer(
+                    pd.MultiIndex.from_arrays([
+                        sg,
+                        column if by_access else blank,
+                        item if by_item else blank,
+                    ])
+                )
+                rows = np.flatnonzero(hit >= 0)
+                decision[rows] = level["kind"].map(DECISION_KINDS).to_numpy()[hit[rows]]
+                note[rows] = level["note"].to_numpy()[hit[rows]]
+
+        return pd.DataFrame({"Decision": decision, "Decision Note": note}, index=diff_items.index)
+
+    def annotate_pairs(self, pairs: pd.DataFrame, client: str = "") -> pd.DataFrame:
+        """
+        Duplicate decision and note for each similarity pair (SG 1, SG 2),
+        as a frame aligned with it.
+        """
+        decision = np.full(len(pairs), "", dtype=object)
+        note = np.full(len(pairs), "", dtype=object)
+
+        first = pairs["SG 1"].astype(str).to_numpy(dtype=object)
+        second = pairs["SG 2"].astype(str).to_numpy(dtype=object)
+        found = self._decisions_for_sgs(
+            set(np.minimum(first, second)) if len(pairs) else set(), ["duplicate"], client
+        )
+
+        if not found.empty:
+            found = found.drop_duplicates(["sg", "other_sg"], keep="last")
+            hit = pd.MultiIndex.from_frame(found[["sg", "other_sg"]]).get_indexer(
+                pd.MultiIndex.from_arrays([np.minimum(first, second), np.maximum(first, second)])
+            )
+            rows = np.flatnonzero(hit >= 0)
+            decision[rows] = DECISION_KINDS["duplicate"]
+            note[rows] = found["note"].to_numpy()[hit[rows]]
+
+        return pd.DataFrame({"Decision": decision, "Decision Note": note}, index=pairs.index)
+
+    # --------------------------------------------------------------------
+    # One-time import of the legacy spreadsheets
+    # --------------------------------------------------------------------
+    def import_spreadsheets(self, spreadsheets: dict = None, force: bool = False) -> dict:
+        """
+        Import the legacy decision spreadsheets (kind -> path) once.
+        Headers are matched case-insensitively against known aliases;
+        rows without an SG are skipped and existing decisions are kept.
+        Returns rows imported per kind.
+        """
+        spreadsheets = LEGACY_SPREADSHEETS if spreadsheets is None else spreadsheets
+        imported = {}
+
+        for kind, path in spreadsheets.items():
+            if not os.path.exists(path):
+                continue
+            source = os.path.abspath(path)
+            with closing(self._connect()) as conn:
+                done = conn.execute(
+                    "SELECT 1 FROM imports WHERE source = ?", (source,)
+                ).fetchone()
+            if done and not force:
+                continue
+
+            rows = _spreadsheet_rows(pd.read_excel(path), kind)
+            with closing(self._connect()) as conn, conn:
+                before = conn.total_changes
+                conn.executemany(
+                    """
+                    INSERT INTO decisions
+                        (kind, client, sg, access_type, item, other_sg, note, decided_by, decided_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT DO NOTHING
+                    """,
+                    rows,
+                )
+                count = conn.total_changes - before
+                conn.execute(
+                    "INSERT OR REPLACE INTO imports VALUES (?, ?, ?)", (source, count, _now())
+                )
+            imported[kind] = count
+            if count:
+                self._changed()
+
+        return imported
+
+
+def _spreadsheet_rows(df: pd.DataFrame, kind: str) -> list:
+    """
+    Decision rows (in insert order of the decisions columns) from a legacy
+    spreadsheet.
+    """
+    headers = {str(col).strip().lower(): col for col in df.columns}
+    picked = {}
+    for field, aliases in _ALIASES.items():
+        for alias in aliases:
+            if alias in headers and headers[alias] not in picked.values():
+                picked[field] = headers[alias]
+                break
+
+    if "sg" not in picked:
+        return []
+
+    def values(field):
+        if field not in picked:
+            return [""] * len(df)
+        return [_text(v) for v in df[picked[field]]]
+
+    now = _now()
+    rows = []
+    for client, sg, access_type, item, other_sg, note, decided_by in zip(
+        values("client"), values("sg"), values("access_type"), values("item"),
+        values("other_sg"), values("note"), values("decided_by"),
+    ):
+        if not sg:
+            continue
+        if kind == "duplicate" and other_sg and other_sg < sg:
+            sg, other_sg = other_sg, sg
+        rows.append((kind, client, sg, access_type, item, other_sg, note, decided_by, now))
+    return rows
+
+
+@lru_cache(maxsize=None)
+def open_store(path: str = DECISIONS_DB) -> DecisionStore:
+    """
+    The process-wide decision store for `path`, with the legacy
+    spreadsheets imported on first use.
+    """
+    store = DecisionStore(path)
+    store.import_spreadsheets()
+    return store
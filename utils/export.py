@@ -0,0 +1,234 @@
+"""
+Excel export of a full analysis report: summary, missing and custom SGs,
+item-level differences and similar SG pairs in one workbook.
+
+The workbook is written with xlsxwriter in constant-memory mode: each row
+is flushed to disk as soon as the next one starts, so memory stays flat
+however large the tenant. Reports are cached on disk by upload key.
+"""
+import hashlib
+import os
+import threading
+
+import pandas as pd
+import xlsxwriter
+
+from utils.cache import CACHE_DIR, evict_lru
+from utils.report import DiffItemIndex
+
+# Upper bound for the on-disk report cache; least recently used reports
+# are evicted beyond it.
+REPORT_CACHE_BYTES = 256 << 20
+
+# Bump when the layout of exported reports changes.
+REPORT_VERSION = 1
+
+# Excel's limit for the text of one cell.
+MAX_CELL_CHARS = 32767
+
+_REPORTS_LOCK = threading.Lock()
+
+
+def _formats(workbook) -> dict:
+    return {
+        "title": workbook.add_format({"bold": True, "font_size": 14, "font_color": "#2A61FF"}),
+        "header": workbook.add_format({
+            "bold": True, "bg_color": "#2A61FF", "font_color": "#FFFFFF", "border": 1,
+        }),
+        "cell": workbook.add_format({"valign": "top", "border": 1}),
+        "number": workbook.add_format({"valign": "top", "border": 1, "align": "center"}),
+        "wrap": workbook.add_format({"valign": "top", "border": 1, "text_wrap": True}),
+        "Missing": workbook.add_format({"font_color": "red", "bold": True}),
+        "Extra": workbook.add_format({"font_color": "black"}),
+        "cell Missing": workbook.add_format({
+            "valign": "top", "border": 1, "text_wrap": True, "font_color": "red", "bold": True,
+        }),
+        "cell Extra": workbook.add_format({
+            "valign": "top", "border": 1, "text_wrap": True, "font_color": "black",
+        }),
+    }
+
+
+def _table_sheet(workbook, fmt, name: str, columns: list, rows, widths: list):
+    """
+    One sheet of plain rows under a header row, written top to bottom.
+    """
+    sheet = workbook.add_worksheet(name)
+    for c, width in enumerate(widths):
+        sheet.set_column(c, c, width)
+    sheet.freeze_panes(1, 0)
+    sheet.write_row(0, 0, columns, fmt["header"])
+
+    r = 0
+    for r, values in enumerate(rows, start=1):
+        for c, value in enumerate(values):
+            if isinstance(value, str):
+                sheet.write_string(r, c, value, fmt["cell"])
+            else:
+                sheet.write_number(r, c, value, fmt["number"])
+    if r:
+        sheet.autofilter(0, 0, r, len(columns) - 1)
+    return sheet
+
+
+def _diff_fragments(fmt, items) -> list:
+    """
+    Rich-string fragments for one diff row's (kind, item) pairs, cut to
+    Excel's cell limit.
+    """
+    fragments = []
+    length = 0
+    for k, (typ, item) in enumerate(items):
+        line = f"{typ}: {item}"
+        if length + len(line) + 1 > MAX_CELL_CHARS - 40:
+            fragments += [fmt["Extra"], f"\n… {len(items) - k} more item(s)"]
+            break
+        if fragments:
+            line = "\n" + line
+        fragments += [fmt[typ], line]
+        length += len(line)
+    return fragments
+
+
+def write_report(target, results: dict, similarity_results: pd.DataFrame = None,
+                 baseline: str = "Standard", client_name: str = ""):
+    """
+    Write one baseline's results (and, when known, similar SG pairs) as
+    an .xlsx workbook to `target`, a path or a binary file object.
+    """
+    only_in_std = results["only_in_std"]
+    only_in_client = results["only_in_client"]
+    diff_table = results["diff_table"]
+    index = DiffItemIndex(results["diff_items"], len(diff_table))
+
+    workbook = xlsxwriter.Workbook(target, {"constant_memory": True, "in_memory": False})
+    fmt = _formats(workbook)
+
+    # Summary
+    summary = workbook.add_worksheet("Summary")
+    summary.set_column(0, 0, 42)
+    summary.set_column(1, 1, 18)
+    summary.write_string(0, 0, "Security Analysis Report", fmt["title"])
+    details = [
+        ("Client", client_name or "—"),
+        ("Baseline", baseline),
+        ("Missing Security Group(s)", len(only_in_std)),
+        ("Custom Security Group(s)", len(only_in_client)),
+        ("Security Group - Differences Found", len(diff_table)),
+        ("Missing items", int(index.n_missing.sum())),
+        ("Extra items", int(index.n_extra.sum())),
+    ]
+    if similarity_results is not None:
+        details.append(("High-similarity SG pairs", len(similarity_results)))
+    for r, (label, value) in enumerate(details, start=2):
+        summary.write_string(r, 0, label, fmt["cell"])
+        if isinstance(value, str):
+            summary.write_string(r, 1, value, fmt["cell"])
+        else:
+            summary.write_number(r, 1, value, fmt["number"])
+
+    # Missing / custom SGs
+    _table_sheet(
+        workbook, fmt, "Missing SGs", ["S.No", "Security Group"],
+        ((i, str(sg)) for i, sg in enumerate(only_in_std, start=1)), [8, 70],
+    )
+    _table_sheet(
+        workbook, fmt, "Custom SGs", ["S.No", "Security Group"],
+        ((i, str(sg)) for i, sg in enumerate(only_in_client, start=1)), [8, 70],
+    )
+
+    # Item-level differences, Missing in bold red and Extra in black
+    sheet = workbook.add_worksheet("Differences")
+    sheet.set_column(0, 0, 8)
+    sheet.set_column(1, 2, 40)
+    sheet.set_column(3, 3, 90)
+    sheet.freeze_panes(1, 0)
+    sheet.write_row(
+        0, 0, ["S.No", "Security Group", "Access Type", "Difference Items"], fmt["header"]
+    )
+
+    sgs = diff_table["SG Name"].astype(str).to_numpy()
+    columns = diff_table["Column"].astype(str).to_numpy()
+    for row in range(len(diff_table)):
+        r = row + 1
+        sheet.write_number(r, 0, r, fmt["number"])
+        sheet.write_string(r, 1, sgs[row], fmt["cell"])
+        sheet.write_string(r, 2, columns[row], fmt["cell"])
+
+        items = index.items(row)
+        if len(items) == 1:
+            # a single fragment is not a rich string; format the whole cell
+            typ, item = items[0]
+            sheet.write_string(r, 3, f"{typ}: {item}", fmt[f"cell {typ}"])
+        elif items:
+            sheet.write_rich_string(r, 3, *_diff_fragments(fmt, items), fmt["wrap"])
+    if len(diff_table):
+        sheet.autofilter(0, 0, len(diff_table), 3)
+
+    # Similar SG pairs
+    if similarity_results is not None:
+        _table_sheet(
+            workbook, fmt, "Similarity", ["S.No", "SG 1", "SG 2", "Similarity"],
+            (
+                (i, str(a), str(b), float(s))
+                for i, (a, b, s) in enumerate(
+                    zip(
+                        similarity_results["SG 1"],
+                        similarity_results["SG 2"],
+                        similarity_results["Similarity"],
+                    ),
+                    start=1,
+                )
+            ),
+            [8, 50, 50, 12],
+        )
+
+    workbook.close()
+
+
+def _reports_dir(cache_dir: str) -> str:
+    return os.path.join(cache_dir, "reports")
+
+
+def report_path(key: str, baseline: str, with_similarity: bool, client_name: str = "",
+                cache_dir: str = CACHE_DIR) -> str:
+    """
+    Cache path of an upload's report against one baseline. The client
+    name is part of the key since the Summary sheet shows it.
+    """
+    slug = "".join(c if c.isalnum() else "_" for c in baseline)
+    client = hashlib.sha256(client_name.encode()).hexdigest()[:12]
+    part = "full" if with_similarity else "diff"
+    return os.path.join(
+        _reports_dir(cache_dir), f"{key}-v{REPORT_VERSION}-{slug}-{client}-{part}.xlsx"
+    )
+
+
+def export_report(key: str, results: dict, similarity_results: pd.DataFrame = None,
+                  baseline: str = "Standard", client_name: str = "",
+                  cache_dir: str = CACHE_DIR, max_bytes: int = REPORT_CACHE_BYTES) -> str:
+    """
+    Path of the upload's report against `baseline`, written on first
+    request and served from the report cache afterwards.
+    """
+    path = report_path(key, baseline, similarity_results is not None, client_name or "", cache_dir)
+    if os.path.exists(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    directory = _reports_dir(cache_dir)
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write_report(tmp, results, similarity_results, baseline, client_name)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    with _REPORTS_LOCK:
+        evict_lru(directory, max_bytes, suffix=".xlsx")
+    return path
@@ -13,14 +13,41 @@ EXPECTED_COLUMNS = [
     "Business Process Types granted to Security Group - View Completed Access"
 ]
 
+# A text column is stored as categorical when it has at most this share of
+# distinct values (repeated cells then share one copy of their text).
+CATEGORICAL_MAX_UNIQUE = 0.5
+
+
+def compact_text_columns(df: pd.DataFrame, columns=None) -> pd.DataFrame:
+    """
+    Store the given text columns (all by default) as categoricals where
+    their values repeat enough for that to be smaller, and as the packed
+    string dtype otherwise (never one Python object per cell). Works in
+    place on `df` (columns are replaced, not copied) and returns it.
+
+    Relies on pandas >= 3 (see requirements.txt): earlier versions map
+    "str" to object dtype and copy on rename, so nothing would be saved.
+    """
+    for col in df.columns if columns is None else columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype) or not len(values):
+            continue
+        if values.nunique(dropna=True) <= CATEGORICAL_MAX_UNIQUE * len(values):
+            df[col] = values.astype("category")
+        elif values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) == "string":
+            df[col] = values.astype("str")
+    return df
+
+
 def normalize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """
     Ensure expected columns exist and rename SG column to 'SG Name'.
+    Access-type columns with repeated cells become categoricals. The input
+    is not copied: with copy-on-write the renamed frame shares its data.
     """
     missing = [c for c in EXPECTED_COLUMNS if c not in df.columns]
     if missing:
         raise KeyError(f"Missing expected columns: {missing}\nGot: {list(df.columns)}")
 
-    df = df.copy()
-    df.rename(columns={"Domains granted to Security Group": "SG Name"}, inplace=True)
-    return df
+    df = df.rename(columns={"Domains granted to Security Group": "SG Name"})
+    return compact_text_columns(df, [c for c in df.columns if c != "SG Name"])
@@ -0,0 +1,301 @@
+import hashlib
+import os
+import pickle
+import re
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import CACHE_DIR
+from utils.comparator import DIFFERENCE_KINDS, DiffCube, compare_frames
+from utils.helpers import compact_text_columns
+from utils.similarity import SimilarityPairs, similarity_pairs_for
+from utils.vocabulary import encoded, encoded_rows
+
+# Bump when the layout of saved snapshots (or how digests are computed) changes.
+SNAPSHOT_FORMAT = 2
+
+# Share of SG names a previous snapshot must have in common with an upload
+# (relative to the larger of the two) to be treated as the same tenant.
+MIN_SG_OVERLAP = 0.5
+
+
+def sg_digests(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Content digest of every SG x access-type cell (uint64), indexed by
+    SG Name. A cell's digest depends only on its set of items, so item
+    order and whitespace do not count as changes.
+
+    Each item text is hashed once and a cell's digest is the sum (mod
+    2**64) of its items' hashes, so digests are computed for all cells in
+    a few array passes and do not depend on the vocabulary's ids.
+    """
+    enc = encoded(df)
+    vocab = enc.vocab
+
+    item_hash = np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+            for text in vocab.items
+        ),
+        dtype=np.uint64,
+        count=len(vocab),
+    )
+    offsets, items = vocab.flat_cells()
+    # per-cell sums as differences of a running (wrapping) sum; empty cells get 0
+    running = np.concatenate([
+        np.zeros(1, dtype=np.uint64), np.cumsum(item_hash[items], dtype=np.uint64)
+    ])
+    cell_digest = running[offsets[1:]] - running[offsets[:-1]]
+    digests = cell_digest[enc.cells]
+
+    out = pd.DataFrame(digests, columns=enc.columns, index=pd.Index(enc.sg_names, name="SG Name"))
+    return out[~out.index.duplicated(keep="first")]
+
+
+def snapshot_drift(previous: pd.DataFrame, current: pd.DataFrame) -> pd.DataFrame:
+    """
+    SGs added, removed or modified between two digest tables, with the
+    access types whose content changed.
+    """
+    added = current.index.difference(previous.index)
+    removed = previous.index.difference(current.index)
+    common = current.index.intersection(previous.index)
+
+    columns = list(dict.fromkeys(list(current.columns) + list(previous.columns)))
+    prev_common = previous.reindex(index=common, columns=columns, fill_value=0).to_numpy()
+    curr_common = current.reindex(index=common, columns=columns, fill_value=0).to_numpy()
+    changed = prev_common != curr_common
+    modified = np.flatnonzero(changed.any(axis=1))
+
+    rows = []
+    for sg in added:
+        rows.append({"Security Group": sg, "Change": "Added", "Access Types Changed": ""})
+    for sg in removed:
+        rows.append({"Security Group": sg, "Change": "Removed", "Access Types Changed": ""})
+    for pos in modified:
+        cols = [columns[k] for k in np.flatnonzero(changed[pos])]
+        rows.append({
+            "Security Group": common[pos],
+            "Change": "Modified",
+            "Access Types Changed": "\n".join(cols),
+        })
+
+    drift = pd.DataFrame(rows, columns=["Security Group", "Change", "Access Types Changed"])
+    return drift.sort_values(["Change", "Security Group"], kind="stable").reset_index(drop=True)
+
+
+def _merge_diff_results(previous: dict, partial: dict, keep_sgs: set, std_df, client_df, columns) -> dict:
+    """
+    Previous diff rows for untouched SGs plus freshly computed rows for the
+    touched ones, in the same order compare_frames would produce.
+    """
+    prev_table = previous["diff_table"]
+    prev_items = previous["diff_items"]
+
+    kept = prev_table["SG Name"].isin(keep_sgs).to_numpy()
+    table = pd.concat([prev_table[kept], partial["diff_table"]], ignore_index=True)
+
+    column_pos = {col: k for k, col in enumerate(columns)}
+    table["_col"] = table["Column"].map(column_pos)
+    table = (
+        table.sort_values(["SG Name", "_col"], kind="stable")
+        .drop(columns="_col")
+        .reset_index(drop=True)
+    )
+    # concatenating different categories falls back to object columns
+    table["SG Name"] = pd.Categorical(table["SG Name"].to_numpy(dtype=object))
+    table["Column"] = pd.Categorical(table["Column"].to_numpy(dtype=object), categories=columns)
+    table = compact_text_columns(table, ["Standard Value", "Client Value"])
+
+    kept_rows = np.flatnonzero(kept)
+    prev_items = prev_items[np.isin(prev_items["Diff Row"].to_numpy(), kept_rows)]
+    items = pd.concat([prev_items, partial["diff_items"]], ignore_index=True)
+
+    keys = pd.MultiIndex.from_frame(table[["SG Name", "Column"]])
+    item_keys = pd.MultiIndex.from_arrays([
+        items["SG Name"].astype(object), items["Column"].astype(object)
+    ])
+    diff_row = keys.get_indexer(item_keys).astype(np.int32)
+
+    item_text = items["Item"].astype(object)
+    items = pd.DataFrame({
+        "Diff Row": diff_row,
+        "SG Name": pd.Categorical(items["SG Name"].astype(object)),
+        "Column": pd.Categorical(items["Column"].astype(object), categories=columns),
+        "Item": pd.Categorical(item_text, categories=sorted(set(item_text))),
+        "Difference": pd.Categorical(items["Difference"].astype(object), categories=DIFFERENCE_KINDS),
+    })
+    order = np.lexsort((
+        items["Item"].cat.codes.to_numpy(),
+        items["Difference"].cat.codes.to_numpy(),
+        diff_row,
+    ))
+    items = items.iloc[order].reset_index(drop=True)
+
+    std_set = set(std_df["SG Name"])
+    client_set = set(client_df["SG Name"])
+
+    return {
+        "only_in_std": sorted(list(std_set - client_set)),
+        "only_in_client": sorted(list(client_set - std_set)),
+        "diff_table": table,
+        "diff_items": items,
+        "diff_cube": DiffCube.from_items(items),
+    }
+
+
+def _merge_similarity_pairs(previous: SimilarityPairs, partial: SimilarityPairs, stale: set, client_df) -> SimilarityPairs:
+    """
+    Previous floor-level pairs between unchanged SGs, re-indexed into the
+    new frame, plus the recomputed pairs involving changed SGs.
+    """
+    old_names = pd.Index(previous.sg_names)
+    is_stale = old_names.isin(list(stale))
+    kept = ~(is_stale[previous.left] | is_stale[previous.right])
+
+    new_pos = pd.Index(encoded(client_df).sg_names).get_indexer(old_names)
+    first = new_pos[previous.left[kept]].astype(np.int64)
+    second = new_pos[previous.right[kept]].astype(np.int64)
+
+    return SimilarityPairs(
+        partial.sg_names,
+        np.concatenate([np.minimum(first, second), partial.left.astype(np.int64)]),
+        np.concatenate([np.maximum(first, second), partial.right.astype(np.int64)]),
+        np.concatenate([previous.sim[kept], partial.sim]),
+        partial.floor,
+    )
+
+
+def incremental_update(
+    std_df: pd.DataFrame,
+    client_df: pd.DataFrame,
+    previous: dict,
+    threshold: float = 0.90,
+):
+    """
+    Re-analyze a revised client export against a previous snapshot of the
+    same client, recomputing diffs only for SGs whose permission cells
+    changed and similarity pairs only for pairs involving them.
+
+    `previous` is a snapshot as built by make_snapshot (against the same
+    standard baseline). Returns (diff_results, similarity_results,
+    similarity_pairs, drift, digests). Similarity is None when the snapshot
+    holds no pairs to merge; it then needs a full pass.
+    """
+    digests = sg_digests(client_df)
+    drift = snapshot_drift(previous["digests"], digests)
+
+    touched = set(drift.loc[drift["Change"] != "Removed", "Security Group"])
+    stale = set(drift["Security Group"])
+    keep_sgs = set(digests.index) - stale
+
+    # the touched rows reuse the upload's encoding (and vocabulary)
+    rows = np.flatnonzero(client_df["SG Name"].isin(touched).to_numpy())
+    sub_df = client_df.iloc[rows]
+    encoded_rows(sub_df, client_df, rows)
+    partial = compare_frames(std_df, sub_df)
+    columns = [col for col in std_df.columns if col != "SG Name"]
+    diff_results = _merge_diff_results(
+        previous["diff_results"], partial, keep_sgs, std_df, client_df, columns
+    )
+
+    previous_pairs = previous.get("similarity_pairs")
+    if previous_pairs is None:
+        return diff_results, None, None, drift, digests
+
+    pairs = _merge_similarity_pairs(
+        previous_pairs,
+        similarity_pairs_for(client_df, touched, floor=previous_pairs.floor),
+        stale,
+        client_df,
+    )
+    return diff_results, pairs.frame(threshold), pairs, drift, digests
+
+
+def shares_tenant(previous: dict, client_df: pd.DataFrame) -> bool:
+    """
+    Whether a previous snapshot looks like the same tenant as the upload:
+    at least MIN_SG_OVERLAP of their SG names in common. Guards against
+    another tenant's snapshot saved under the same client name.
+    """
+    before = previous["digests"].index
+    now = pd.Index(client_df["SG Name"].unique())
+    common = len(before.intersection(now))
+    return common > 0 and common >= MIN_SG_OVERLAP * max(len(before), len(now))
+
+
+def can_update_incrementally(client_df: pd.DataFrame, previous: dict, baseline_digest: str) -> bool:
+    """
+    Incremental re-analysis needs the same baseline, unique SG names and
+    a snapshot of the same tenant.
+    """
+    return (
+        previous is not None
+        and previous.get("format") == SNAPSHOT_FORMAT
+        and previous.get("baseline_digest") == baseline_digest
+        and not client_df["SG Name"].duplicated().any()
+        and not previous["digests"].index.duplicated().any()
+        and shares_tenant(previous, client_df)
+    )
+
+
+def make_snapshot(
+    upload_key, baseline_digest, digests, diff_results, similarity_results, drift, similarity_pairs=None
+) -> dict:
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "upload_key": upload_key,
+        "baseline_digest": baseline_digest,
+        "digests": digests,
+        "diff_results": diff_results,
+        "similarity_results": similarity_results,
+        "similarity_pairs": similarity_pairs,
+        "drift": drift,
+    }
+
+
+def _snapshot_file(client_name: str, cache_dir: str):
+    """
+    Snapshot path of a named client; None without a name, so unnamed
+    uploads never share (and overwrite) one slot.
+    """
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", (client_name or "").strip())
+    if not slug:
+        return None
+    return os.path.join(cache_dir, "snapshots", f"{slug}.pkl")
+
+
+def load_snapshot(client_name: str, cache_dir: str = CACHE_DIR):
+    """
+    Latest saved snapshot for a client, or None.
+    """
+    path = _snapshot_file(client_name, cache_dir)
+    if path is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+    except Exception:
+        return None
+    # digests of another format would read as every SG modified
+    return snapshot if snapshot.get("format") == SNAPSHOT_FORMAT else None
+
+
+def save_snapshot(client_name: str, snapshot: dict, cache_dir: str = CACHE_DIR):
+    """
+    Persist a client's latest snapshot (best-effort; skipped without a
+    client name).
+    """
+    path = _snapshot_file(client_name, cache_dir)
+    if path is None:
+        return
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
@@ -0,0 +1,228 @@
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+from pandas.io.parsers.readers import STR_NA_VALUES
+
+from utils.helpers import EXPECTED_COLUMNS, normalize_dataframe
+from utils.instrumentation import span
+
+_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def _column_index(ref: str) -> int:
+    """
+    Zero-based column index of a cell reference such as "AB12".
+    """
+    n = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        n = n * 26 + (ord(ch.upper()) - 64)
+    return n - 1
+
+
+def _first_sheet_path(zf: zipfile.ZipFile) -> str:
+    """
+    Archive path of the workbook's first worksheet.
+    """
+    workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+    sheet = workbook.find(f"{_MAIN}sheets/{_MAIN}sheet")
+    if sheet is None:
+        raise ValueError("Workbook has no worksheets")
+    rel_id = sheet.get(f"{_REL}id")
+
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter(f"{_PKG_REL}Relationship"):
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target")
+            if target.startswith("/"):
+                return target.lstrip("/")
+            return posixpath.normpath(posixpath.join("xl", target))
+
+    raise ValueError("Could not locate the first worksheet")
+
+
+def _string_item_text(si) -> str:
+    # plain <t>, or rich-text runs <r><t>; phonetic runs (<rPh>) are skipped
+    parts = []
+    for child in si:
+        if child.tag == f"{_MAIN}t":
+            parts.append(child.text or "")
+        elif child.tag == f"{_MAIN}r":
+            t = child.find(f"{_MAIN}t")
+            if t is not None:
+                parts.append(t.text or "")
+    return "".join(parts)
+
+
+def _shared_strings(zf: zipfile.ZipFile, wanted) -> dict:
+    """
+    Shared-string table entries for the given indices only.
+    Parsing stops once the highest wanted index has been read.
+    """
+    if not wanted or "xl/sharedStrings.xml" not in zf.namelist():
+        return {}
+
+    last = max(wanted)
+    found = {}
+    index = 0
+    with zf.open("xl/sharedStrings.xml") as src:
+        for _, el in ET.iterparse(src):
+            if el.tag != f"{_MAIN}si":
+                continue
+            if index in wanted:
+                found[index] = _string_item_text(el)
+            el.clear()
+            if index >= last:
+                break
+            index += 1
+    return found
+
+
+def _cell_value(c):
+    """
+    Raw cell value: an int for a shared-string reference, a float for a
+    number, text otherwise (None when empty or an error such as #N/A).
+    Booleans become "True"/"False", as pandas rendered them.
+    """
+    kind = c.get("t")
+    if kind == "inlineStr":
+        is_ = c.find(f"{_MAIN}is")
+        return None if is_ is None else _string_item_text(is_)
+
+    v = c.find(f"{_MAIN}v")
+    if v is None or v.text is None or kind == "e":
+        return None
+    if kind == "s":
+        return int(v.text)
+    if kind == "b":
+        return "True" if v.text.strip() == "1" else "False"
+    if kind in (None, "n"):
+        return float(v.text)
+    return v.text
+
+
+def _iter_rows(src, columns=None):
+    """
+    Stream worksheet rows as {column index: raw value} dicts, keeping
+    only the given column indices (all when None).
+    """
+    sheet_data = None
+    for event, el in ET.iterparse(src, events=("start", "end")):
+        if event == "start":
+            if el.tag == f"{_MAIN}sheetData":
+                sheet_data = el
+            continue
+        if el.tag != f"{_MAIN}row":
+            continue
+
+        values = {}
+        for pos, c in enumerate(el.iter(f"{_MAIN}c")):
+            ref = c.get("r")
+            col = _column_index(ref) if ref else pos
+            if columns is None or col in columns:
+                values[col] = _cell_value(c)
+
+        # drop parsed rows so memory stays flat on large sheets
+        sheet_data.clear()
+        yield values
+
+
+def _text(value):
+    if value is None or value in STR_NA_VALUES:
+        return None
+    return value if value.strip() else None
+
+
+def _number_text(value: float, as_float: bool) -> str:
+    if as_float or not value.is_integer():
+        return str(value)
+    return str(int(value))
+
+
+def _column_text(values) -> list:
+    """
+    Text of one column's resolved cells, matching what
+    pd.read_excel(...) followed by str() gave: strings pandas reads as
+    missing ("N/A", "NULL", ...) are dropped, whole numbers print as ints,
+    except in an all-numeric column with blanks or fractions, which
+    pandas stored as float64 ("1.0").
+    """
+    values = [v if isinstance(v, float) else _text(v) for v in values]
+    as_float = not any(isinstance(v, str) for v in values) and any(
+        v is None or not v.is_integer() for v in values
+    )
+    return [_number_text(v, as_float) if isinstance(v, float) else v for v in values]
+
+
+def _export_columns(source) -> dict:
+    """
+    EXPECTED_COLUMNS of the first worksheet as {column: list of values},
+    validating the header before any body row is parsed.
+    """
+    with zipfile.ZipFile(source) as zf:
+        sheet = _first_sheet_path(zf)
+
+        with zf.open(sheet) as src:
+            rows = _iter_rows(src)
+            header = next(rows, {})
+            rows.close()
+
+        header_strings = _shared_strings(
+            zf, {v for v in header.values() if isinstance(v, int)}
+        )
+        names = {}
+        for col in sorted(header):
+            value = header[col]
+            name = header_strings.get(value) if isinstance(value, int) else value
+            names.setdefault("" if name is None else str(name), col)
+
+        missing = [c for c in EXPECTED_COLUMNS if c not in names]
+        if missing:
+            raise KeyError(f"Missing expected columns: {missing}\nGot: {list(names)}")
+
+        wanted = [names[c] for c in EXPECTED_COLUMNS]
+        wanted_set = set(wanted)
+
+        body = []
+        with zf.open(sheet) as src:
+            rows = _iter_rows(src, wanted_set)
+            next(rows, None)  # header
+            for values in rows:
+                row = [values.get(col) for col in wanted]
+                if any(v is not None for v in row):
+                    body.append(row)
+
+        refs = {v for row in body for v in row if isinstance(v, int)}
+        strings = _shared_strings(zf, refs)
+
+    return {
+        name: _column_text(
+            strings.get(v) if isinstance(v, int) else v
+            for v in (row[k] for row in body)
+        )
+        for k, name in enumerate(EXPECTED_COLUMNS)
+    }
+
+
+def read_export(source) -> pd.DataFrame:
+    """
+    Read a Workday security export (.xlsx path or file-like) into a
+    normalized dataframe.
+
+    The first worksheet's XML is streamed and only EXPECTED_COLUMNS are
+    kept. The header row is checked before any body row is parsed, and
+    only the shared strings those columns reference are loaded. Cells
+    become text (or missing) as pandas' reader rendered them, and fully
+    blank rows are skipped.
+    """
+    with span("parse_xlsx") as stage:
+        data = _export_columns(source)
+        stage["rows"] = len(data[EXPECTED_COLUMNS[0]])
+
+    with span("normalize_dataframe", rows=len(data[EXPECTED_COLUMNS[0]])):
+        return normalize_dataframe(pd.DataFrame(data, columns=EXPECTED_COLUMNS))
@@ -0,0 +1,300 @@
+"""
+Lightweight per-stage instrumentation.
+
+A StageRecorder collects spans (wall time, row counts and, while memory
+tracing is on, peak traced memory) for one Streamlit session. Pages
+activate the session's recorder at the start of each run, and code
+anywhere below them, utils included, opens spans with `span(...)`. With no
+active recorder a span costs next to nothing, so batch and benchmark runs
+are unaffected.
+"""
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import deque
+from contextlib import contextmanager
+
+# Spans kept per session (oldest dropped first).
+MAX_SPANS = 2000
+
+_ACTIVE = contextvars.ContextVar("active_recorder", default=None)
+
+# sessions that currently want memory tracing; tracemalloc runs while any does.
+# Sessions are identified by a counter token, never reused (unlike id()).
+_TRACING_SESSIONS = set()
+_TRACING_LOCK = threading.Lock()
+_TRACING_TOKENS = itertools.count()
+
+
+def _set_tracing(owner: int, enabled: bool):
+    with _TRACING_LOCK:
+        if enabled:
+            _TRACING_SESSIONS.add(owner)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        else:
+            _TRACING_SESSIONS.discard(owner)
+            if not _TRACING_SESSIONS and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+
+def _rss_bytes() -> int:
+    """
+    Current resident set size of the process (0 where unavailable).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+class StageRecorder:
+    """
+    Spans recorded for one session, grouped into numbered runs.
+
+    Memory figures come from tracemalloc, which is process-wide: with
+    several sessions analyzing at once a span's peak includes their
+    allocations too.
+    """
+
+    def __init__(self, max_spans: int = MAX_SPANS):
+        self.spans = deque(maxlen=max_spans)
+        self.run = 0
+        self.page = ""
+        self.trace_memory = False
+        self._origin = time.perf_counter()
+        self._stack = []
+        self._trace_token = next(_TRACING_TOKENS)
+        self._trace_release = None
+
+    def set_trace_memory(self, enabled: bool):
+        self.trace_memory = bool(enabled)
+        _set_tracing(self._trace_token, self.trace_memory)
+        if self.trace_memory and self._trace_release is None:
+            # a session closed with tracing on releases it when collected,
+            # so tracemalloc does not stay on for the whole process
+            self._trace_release = weakref.finalize(
+                self, _set_tracing, self._trace_token, False
+            )
+
+    def begin(self, page: str):
+        """
+        Activate this recorder for the rest of the current script run.
+        Streamlit runs each script in its own thread context, so the
+        activation does not leak into other sessions.
+        """
+        self.run += 1
+        self.page = page
+        _ACTIVE.set(self)
+
+    @contextmanager
+    def span(self, name: str, **counts):
+        """
+        Time a stage. Yields the span record; callers may add counts
+        (e.g. record["rows"] = len(df)) before the block ends.
+        """
+        record = {
+            "name": name,
+            "page": self.page,
+            "run": self.run,
+            "depth": len(self._stack),
+            **counts,
+        }
+
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                parent = self._stack[-1]
+                parent["_peak"] = max(parent["_peak"], peak)
+            tracemalloc.reset_peak()
+            record["_base"] = current
+            record["_peak"] = current
+
+        self._stack.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = time.perf_counter() - started
+            self._stack.pop()
+
+            record["start_s"] = round(started - self._origin, 6)
+            record["wall_s"] = round(elapsed, 6)
+            record["rss_mb"] = round(_rss_bytes() / 2**20, 1)
+
+            base = record.pop("_base", None)
+            peak = record.pop("_peak", None)
+            if tracing and tracemalloc.is_tracing():
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                record["peak_mb"] = round((peak - base) / 2**20, 2)
+                if self._stack and "_peak" in self._stack[-1]:
+                    parent = self._stack[-1]
+                    parent["_peak"] = max(parent["_peak"], peak)
+
+            self.spans.append(record)
+
+    def records(self) -> list:
+        return list(self.spans)
+
+    def latest_runs(self) -> list:
+        """
+        Spans of the most recent run of each page.
+        """
+        last = {}
+        for record in self.spans:
+            last[record["page"]] = max(last.get(record["page"], 0), record["run"])
+        return [r for r in self.spans if last.get(r["page"]) == r["run"]]
+
+    def clear(self):
+        self.spans.clear()
+
+    def to_json(self) -> str:
+        return json.dumps({"spans": self.records()}, indent=2, default=str)
+
+    def to_trace(self) -> str:
+        """
+        Chrome trace-event JSON (chrome://tracing, Perfetto), one complete
+        event per span, one track per page.
+        """
+        pages = {}
+        events = []
+        for record in self.spans:
+            tid = pages.setdefault(record["page"], len(pages) + 1)
+            args = {k: v for k, v in record.items() if k not in ("name", "start_s", "wall_s")}
+            events.append({
+                "name": record["name"],
+                "cat": record["page"] or "app",
+                "ph": "X",
+                "ts": int(record["start_s"] * 1e6),
+                "dur": int(record["wall_s"] * 1e6),
+                "pid": 1,
+                "tid": tid,
+                "args": args,
+            })
+        for page, tid in pages.items():
+            events.append({
+                "name": "thread_name", "ph": "M", "pid": 1, "tid": tid,
+                "args": {"name": page or "app"},
+            })
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, default=str)
+
+
+@contextmanager
+def _noop_span():
+    yield {}
+
+
+def span(name: str, **counts):
+    """
+    A span on the active recorder, or a no-op when none is active.
+    """
+    recorder = _ACTIVE.get()
+    if recorder is None:
+        return _noop_span()
+    return recorder.span(name, **counts)
+
+
+def session_recorder(state) -> StageRecorder:
+    """
+    The recorder kept in a session's state (created on first use).
+    """
+    if "stage_recorder" not in state:
+        state["stage_recorder"] = StageRecorder()
+    return state["stage_recorder"]
+
+
+def diagnostics_panel(recorder: StageRecorder):
+    """
+    Optional sidebar diagnostics: a toggle, the latest run's spans per
+    page, the session's memory footprint on demand, process-wide
+    single-flight counters, and JSON / trace downloads. Streamlit is imported here so the
+    rest of this module stays usable without it.
+    """
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander("🩺 Diagnostics", expanded=False):
+        enabled = st.toggle(
+            "Trace memory",
+            value=recorder.trace_memory,
+            help="Record peak memory per stage (tracemalloc). Slows analysis while on.",
+        )
+        if enabled != recorder.trace_memory:
+            recorder.set_trace_memory(enabled)
+
+        if st.toggle(
+            "Session memory",
+            value=False,
+            help="Deep size of this session's state and of the upload's "
+                 "encoding and item vocabulary, next to its size with one "
+                 "Python string per text cell. Standard baselines are "
+                 "shared by all sessions and listed once.",
+        ):
+            from utils.memory import session_footprint
+            from utils.vocabulary import encoded
+
+            client_df = st.session_state.get("client_df")
+            derived = {}
+            if client_df is not None:
+                derived["(encoding)"] = encoded(client_df)
+            footprint = session_footprint(
+                st.session_state,
+                shared=st.session_state.get("baselines", {}).values(),
+                derived=derived,
+            )
+            own = footprint[footprint["Key"] != "(shared)"]
+            st.caption(
+                f"Session total: {own['Size (MB)'].sum():.1f} MB "
+                f"(object-dtype layout: {own['Object-dtype (MB)'].sum():.1f} MB)"
+            )
+            if client_df is not None:
+                vocab = derived["(encoding)"].vocab
+                st.caption(
+                    f"Item vocabulary: {len(vocab):,} items, "
+                    f"{len(vocab.cells):,} distinct cells"
+                )
+            st.dataframe(footprint, hide_index=True, use_container_width=True)
+
+        from utils.jobs import flight_stats
+
+        flights = flight_stats()
+        if not flights.empty:
+            st.caption(
+                f"Shared computations: {flights['shared'].sum()} saved, "
+                f"{flights['computed'].sum()} run (all sessions)"
+            )
+            st.dataframe(flights, hide_index=True, use_container_width=True)
+
+        records = recorder.latest_runs()
+        if not records:
+            st.caption("No stages recorded yet.")
+            return
+
+        table = pd.DataFrame(records).sort_values(["page", "start_s"], kind="stable")
+        table["Stage"] = ["  " * d + n for d, n in zip(table["depth"], table["name"])]
+        table["Wall (ms)"] = (table["wall_s"] * 1000).round(1)
+        columns = ["page", "Stage", "Wall (ms)"]
+        if "peak_mb" in table:
+            table["Peak (MB)"] = table["peak_mb"]
+            columns.append("Peak (MB)")
+        if "rows" in table:
+            table["Rows"] = table["rows"].astype("Int64")
+            columns.append("Rows")
+        columns.append("rss_mb")
+
+        st.dataframe(
+            table[columns].rename(columns={"page": "Page", "rss_mb": "RSS (MB)"}),
+            hide_index=True,
+            use_container_width=True,
+        )
+
+        d1, d2 = st.columns(2)
+        d1.download_button("JSON", recorder.to_json(), "diagnostics.json", "application/json")
+        d2.download_button("Trace", recorder.to_trace(), "diagnostics.trace.json", "application/json")
@@ -0,0 +1,260 @@
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.similarity import SIMILARITY_FLOOR, SimilarityPairs, iter_similarity_blocks
+from utils.vocabulary import encoded
+
+# Finished jobs kept for late readers (oldest dropped first).
+MAX_FINISHED_JOBS = 16
+
+_JOBS = OrderedDict()
+_JOBS_LOCK = threading.Lock()
+
+# How a single-flight request was served: computed it, shared another
+# session's in-flight computation (one saved), or failed.
+FLIGHT_OUTCOMES = ["computed", "shared", "failed"]
+
+
+class SimilarityJob:
+    """
+    Exact SG similarity for one client frame, computed on a background
+    thread block by block. Readers may poll progress and the pairs found
+    so far while it runs.
+
+    Pairs are kept down to `floor` (as SimilarityPairs in `pairs`); the
+    `result` frame holds those at or above `threshold`.
+
+    `on_done(result, pairs)` runs on the worker thread once the result is
+    ready (e.g. to persist it); its failures do not fail the job. Sessions
+    joining the job add theirs with add_done_callback.
+    """
+
+    def __init__(self, key: str, df: pd.DataFrame, threshold: float = 0.90,
+                 on_done=None, floor: float = SIMILARITY_FLOOR):
+        self.key = key
+        self.threshold = threshold
+        self.floor = floor
+        self.status = "running"
+        self.rows_done = 0
+        self.rows_total = len(df)
+        self.result = None
+        self.pairs = None
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+
+        self._df = df
+        self._sg_names = None
+        self._callbacks = [] if on_done is None else [on_done]
+        self._blocks = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name=f"similarity-{key[:12]}", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self._sg_names = encoded(self._df).sg_names
+            for done, total, left, right, sim in iter_similarity_blocks(self._df, self.floor):
+                with self._lock:
+                    self._blocks.append((left, right, sim))
+                    self.rows_done, self.rows_total = done, total
+
+            with self._lock:
+                blocks = list(self._blocks)
+            pairs = SimilarityPairs.from_blocks(self._sg_names, blocks, self.floor)
+            result = pairs.frame(self.threshold)
+            with self._lock:
+                self.pairs = pairs
+                self.result = result
+                self._blocks = []
+                self.status = "done"
+                callbacks, self._callbacks = self._callbacks, []
+        except Exception as e:
+            with self._lock:
+                self.error = f"{type(e).__name__}: {e}"
+                self.status = "error"
+                self._callbacks = []
+            return
+        finally:
+            self.finished = time.time()
+            self._df = None
+
+        for callback in callbacks:
+            self._call(callback)
+
+    def _call(self, callback):
+        try:
+            callback(self.result, self.pairs)
+        except Exception:
+            pass
+
+    def add_done_callback(self, callback):
+        """
+        Run callback(result, pairs) once the job is done: on the worker
+        thread while it runs, right away if it already finished. Dropped
+        if the job fails.
+        """
+        with self._lock:
+            if self.status == "running":
+                self._callbacks.append(callback)
+                return
+            done = self.status == "done"
+        if done:
+            self._call(callback)
+
+    @property
+    def done(self) -> bool:
+        return self.status != "running"
+
+    @property
+    def progress(self) -> float:
+        if self.status == "done" or not self.rows_total:
+            return 1.0
+        return self.rows_done / self.rows_total
+
+    def partial_results(self) -> pd.DataFrame:
+        """
+        Pairs at or above the threshold found so far, in the final
+        result's order.
+        """
+        with self._lock:
+            if self.result is not None:
+                return self.result
+            blocks = list(self._blocks)
+        if not blocks:
+            return pd.DataFrame(columns=["SG 1", "SG 2", "Similarity"])
+        return SimilarityPairs.from_blocks(self._sg_names, blocks, self.floor).frame(self.threshold)
+
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+
+def start_similarity_job(key: str, df: pd.DataFrame, threshold: float = 0.90,
+                         on_done=None) -> SimilarityJob:
+    """
+    Start (or join) the background similarity job for `key`. A job that
+    is running or finished for the same key is returned as is; the
+    joining caller's `on_done` still runs once it is done.
+    """
+    with _JOBS_LOCK:
+        job = _JOBS.get(key)
+        joined = job is not None and job.status != "error"
+        if joined:
+            _JOBS.move_to_end(key)
+            _FLIGHTS.count("similarity", "shared")
+        else:
+            job = SimilarityJob(key, df, threshold, on_done)
+            _JOBS[key] = job
+            _prune_jobs()
+            _FLIGHTS.count("similarity", "computed")
+
+    if not joined:
+        return job.start()
+    if on_done is not None:
+        # outside the registry lock: it may run right away (job finished)
+        job.add_done_callback(on_done)
+    return job
+
+
+def get_job(key: str):
+    with _JOBS_LOCK:
+        return _JOBS.get(key)
+
+
+def _prune_jobs():
+    finished = [k for k, job in _JOBS.items() if job.done]
+    for key in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _JOBS[key]
+
+
+# ------------------------------------------------------------------------------
+# SINGLE-FLIGHT COMPUTATIONS
+# ------------------------------------------------------------------------------
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs each keyed computation once at a time across sessions. Callers
+    asking for a key that is already being computed wait for it and get
+    the same result object (or exception) instead of computing it again.
+
+    Results are shared between sessions, so callers must treat them as
+    read-only. Only in-flight computations are joined; finished ones are
+    the result cache's business.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def count(self, kind: str, outcome: str):
+        with self._lock:
+            counts = self._counts.setdefault(kind, dict.fromkeys(FLIGHT_OUTCOMES, 0))
+            counts[outcome] += 1
+
+    def run(self, kind: str, key: str, fn):
+        with self._lock:
+            flight = self._flights.get((kind, key))
+            leader = flight is None
+            if leader:
+                flight = self._flights[(kind, key)] = _Flight()
+        self.count(kind, "computed" if leader else "shared")
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+        except Exception as e:
+            flight.error = e
+            self.count(kind, "failed")
+            raise
+        finally:
+            with self._lock:
+                del self._flights[(kind, key)]
+            flight.event.set()
+        return flight.result
+
+    def stats(self) -> pd.DataFrame:
+        """
+        Computations run, shared with a waiting session (i.e. saved) and
+        failed, per kind.
+        """
+        with self._lock:
+            counts = {kind: dict(c) for kind, c in self._counts.items()}
+        return pd.DataFrame(
+            [{"Computation": kind, **c} for kind, c in sorted(counts.items())],
+            columns=["Computation", *FLIGHT_OUTCOMES],
+        )
+
+
+_FLIGHTS = SingleFlight()
+
+
+def single_flight(kind: str, key: str, fn):
+    """
+    fn() computed once for concurrent callers with the same (kind, key);
+    see SingleFlight.
+    """
+    return _FLIGHTS.run(kind, key, fn)
+
+
+def flight_stats() -> pd.DataFrame:
+    return _FLIGHTS.stats()
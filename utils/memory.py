@@ -0,0 +1,122 @@
+"""
+Approximate memory footprint of a session's state.
+
+Sizes are deep: dataframes count their string payloads, arrays and
+sparse matrices their buffers (object arrays only their pointers), and
+container or plain objects (results dicts, indexes, encoded frames and
+their item vocabulary) everything they reference. An object reachable
+from several keys is counted once, under the first key, and objects
+shared with other sessions (e.g. the standard baselines) are reported
+separately instead of being charged to the session.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from utils.vocabulary import ItemVocabulary
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def _legacy_frame_bytes(df: pd.DataFrame) -> int:
+    """
+    Size of the same frame with every text column stored as object
+    strings, one string object per cell (the layout before compaction).
+    """
+    total = int(df.index.memory_usage(deep=True))
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(s.dtype):
+            values = s.astype(object)
+            total += 8 * len(values) + sum(
+                sys.getsizeof(v) for v in values if isinstance(v, str)
+            )
+        else:
+            total += int(s.memory_usage(deep=True, index=False))
+    return total
+
+
+class _Sizer:
+    """
+    Deep sizes with shared-reference accounting. `legacy_extra` collects
+    how much larger the frames seen so far would be as object strings.
+    """
+
+    def __init__(self, skip=()):
+        self.seen = set(skip)
+        self.legacy_extra = 0
+
+    def size(self, obj) -> int:
+        if id(obj) in self.seen:
+            return 0
+        self.seen.add(id(obj))
+
+        if isinstance(obj, ItemVocabulary):
+            return obj.nbytes
+
+        if isinstance(obj, pd.DataFrame):
+            size = _frame_bytes(obj)
+            self.legacy_extra += max(0, _legacy_frame_bytes(obj) - size)
+            return size
+        if isinstance(obj, (pd.Series, pd.Index)):
+            return int(obj.memory_usage(deep=True))
+        if isinstance(obj, np.ndarray):
+            # object arrays hold references to strings owned by frames or
+            # the vocabulary, so only their pointers are charged
+            return obj.nbytes
+        if sparse.issparse(obj):
+            return sum(
+                getattr(obj, a).nbytes
+                for a in ("data", "indices", "indptr", "row", "col")
+                if isinstance(getattr(obj, a, None), np.ndarray)
+            )
+
+        size = sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            size += sum(self.size(k) + self.size(v) for k, v in obj.items())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            if all(type(v) is str for v in obj):
+                # plain string containers are sized in bulk
+                size += sum(map(sys.getsizeof, obj))
+            else:
+                size += sum(self.size(v) for v in obj)
+        elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+            size += self.size(vars(obj))
+        return size
+
+
+def session_footprint(state, shared=(), derived=None) -> pd.DataFrame:
+    """
+    Deep size per session-state key, largest first, as MB. `shared`
+    lists objects shared across sessions; their size is reported once
+    under "(shared)" and not charged to any key. `derived` maps labels to
+    objects the session owns but keeps outside its state (such as the
+    upload's encoding and vocabulary); they are sized first, under those
+    labels. "Object-dtype (MB)" estimates the same data with one Python
+    string per text cell.
+    """
+    shared = list(shared)
+    shared_sizer = _Sizer()
+    shared_bytes = sum(shared_sizer.size(obj) for obj in shared)
+
+    sizer = _Sizer(skip=shared_sizer.seen)
+    items = list((derived or {}).items()) + [(key, state[key]) for key in list(state.keys())]
+    rows = []
+    for key, value in items:
+        extra = sizer.legacy_extra
+        size = sizer.size(value)
+        rows.append((str(key), size, size + sizer.legacy_extra - extra))
+
+    rows.sort(key=lambda r: -r[1])
+    if shared:
+        rows.append(("(shared)", shared_bytes, shared_bytes + shared_sizer.legacy_extra))
+
+    return pd.DataFrame({
+        "Key": [r[0] for r in rows],
+        "Size (MB)": [round(r[1] / 2**20, 2) for r in rows],
+        "Object-dtype (MB)": [round(r[2] / 2**20, 2) for r in rows],
+    })
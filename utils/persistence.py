@@ -1,13 +1,14 @@
+from utils.decisions import DECISIONS_DB, open_store
 
-import pandas as pd
-import os
-
-def load_history():
-    def safe_load(path):
-        return pd.read_excel(path) if os.path.exists(path) else pd.DataFrame()
 
+def load_history(path: str = DECISIONS_DB):
+    """
+    Accepted-risk, update and duplicate decisions, in that order. The
+    legacy spreadsheets are imported into the decision store on first use.
+    """
+    store = open_store(path)
     return (
-        safe_load("accepted_risk.xlsx"),
-        safe_load("update_workday.xlsx"),
-        safe_load("duplicate_sg_analysis.xlsx")
+        store.decisions("accepted_risk"),
+        store.decisions("update"),
+        store.decisions("duplicate"),
     )
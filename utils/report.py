@@ -0,0 +1,191 @@
+import html
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.vocabulary import encoded
+
+
+def build_sg_diff_summary(cube) -> pd.DataFrame:
+    """
+    Total item differences per SG, largest first, from a DiffCube.
+    """
+    return cube.sg_totals()[["Security Group", "Total Differences"]]
+
+
+class DiffItemIndex:
+    """
+    Positional view of diff_items for the Difference Report: per diff row
+    Missing/Extra counts and the slice of its items, without any grouping.
+    `labels` (aligned with diff_items, "" for none) are shown after items,
+    e.g. recorded decisions.
+    """
+
+    def __init__(self, diff_items: pd.DataFrame, n_rows: int, labels=None):
+        self.labels = None if labels is None else np.asarray(labels, dtype=object)
+        self.rows = diff_items["Diff Row"].to_numpy()
+        self.kinds = diff_items["Difference"].cat.codes.to_numpy()
+        self.codes = diff_items["Item"].cat.codes.to_numpy()
+        self.item_names = diff_items["Item"].cat.categories.to_numpy(dtype=object)
+        self.kind_names = diff_items["Difference"].cat.categories
+
+        missing_kind = self.kind_names.get_loc("Missing")
+        self.n_missing = np.bincount(self.rows[self.kinds == missing_kind], minlength=n_rows)
+        self.n_extra = np.bincount(self.rows[self.kinds != missing_kind], minlength=n_rows)
+
+        # items of diff row r are bounds[r]:bounds[r + 1]
+        self.bounds = np.searchsorted(self.rows, np.arange(n_rows + 1))
+
+    def items(self, row: int, kind: str = "All"):
+        """
+        (kind, item) pairs of one diff row, optionally only one kind.
+        """
+        out = []
+        for k in range(self.bounds[row], self.bounds[row + 1]):
+            typ = self.kind_names[self.kinds[k]]
+            if kind == "All" or typ == kind:
+                item = self.item_names[self.codes[k]]
+                if self.labels is not None and self.labels[k]:
+                    item = f"{item} [{self.labels[k]}]"
+                out.append((typ, item))
+        return out
+
+
+class SGDetailIndex:
+    """
+    Per-SG lookups for the SG Detail View, built once per upload: the
+    client and standard rows by position (first occurrence, as in
+    compare_frames) and each SG's diff_table rows as one slice of a
+    grouped order. The detail tables of an SG are built on first view and
+    kept for the most recently viewed `max_cached` SGs.
+    """
+
+    def __init__(self, client_df: pd.DataFrame, std_df: pd.DataFrame, diff_table: pd.DataFrame,
+                 cube=None, max_cached: int = 256):
+        self.client_df = client_df
+        self.std_df = std_df
+        self.diff_table = diff_table
+        self.cube = cube
+        self.max_cached = max_cached
+
+        self.client_row = encoded(client_df).row_of
+        self.std_row = encoded(std_df).row_of
+        self.sg_list = sorted(self.client_row)
+
+        sgs = diff_table["SG Name"].astype("category").cat
+        codes = sgs.codes.to_numpy()
+        self.diff_order = np.argsort(codes, kind="stable")
+        # diff rows of SG category c are diff_order[bounds[c]:bounds[c + 1]]
+        self.diff_bounds = np.searchsorted(codes[self.diff_order], np.arange(len(sgs.categories) + 1))
+        self.diff_code = {sg: c for c, sg in enumerate(sgs.categories)}
+
+        self._details = OrderedDict()
+        self._lock = threading.Lock()
+
+    def matches(self, client_df, std_df, diff_table) -> bool:
+        """
+        Whether this index was built for these frames (the same objects).
+        """
+        return self.client_df is client_df and self.std_df is std_df and self.diff_table is diff_table
+
+    def diff_rows(self, sg) -> np.ndarray:
+        code = self.diff_code.get(sg)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return self.diff_order[self.diff_bounds[code]:self.diff_bounds[code + 1]]
+
+    def details(self, sg) -> dict:
+        """
+        Detail tables of one SG: "client" (access type, client value),
+        "comparison" (None when the SG is not in the standard), "diffs"
+        (differing access types) and "breakdown" (item counts from the
+        DiffCube, None without one).
+        """
+        with self._lock:
+            hit = self._details.get(sg)
+            if hit is not None:
+                self._details.move_to_end(sg)
+                return hit
+
+        hit = self._build(sg)
+        with self._lock:
+            self._details[sg] = hit
+            while len(self._details) > self.max_cached:
+                self._details.popitem(last=False)
+        return hit
+
+    def _build(self, sg) -> dict:
+        client = self.client_df.iloc[self.client_row[sg]].drop(labels="SG Name")
+        std_pos = self.std_row.get(sg)
+
+        comparison = None
+        if std_pos is not None:
+            std = self.std_df.iloc[std_pos].drop(labels="SG Name")
+            comparison = pd.DataFrame({
+                "Access Type": client.index,
+                "Client Value": client.values,
+                "Standard Value": std.reindex(client.index).values,
+            })
+
+        diffs = self.diff_table.iloc[self.diff_rows(sg)]
+        return {
+            "client": pd.DataFrame({
+                "Access Type": client.index,
+                "Client Value": client.values,
+            }),
+            "comparison": comparison,
+            "diffs": pd.DataFrame({
+                "Access Type": diffs["Column"].astype(object).to_numpy(),
+                "Standard Value": diffs["Standard Value"].astype(object).to_numpy(),
+                "Client Value": diffs["Client Value"].astype(object).to_numpy(),
+            }, index=diffs.index),
+            "breakdown": None if self.cube is None else self.cube.sg_breakdown(sg),
+        }
+
+
+def diff_text(items) -> str:
+    """
+    (kind, item) pairs as multiline "Kind: item" text.
+    """
+    return "\n".join(f"{typ}: {item}" for typ, item in items)
+
+
+def color_diff(val):
+    """Apply line-by-line coloring for Missing/Extra."""
+    if pd.isna(val):
+        return val
+
+    lines = str(val).split("\n")
+
+    colored = []
+    for line in lines:
+        if line.startswith("Missing:"):
+            colored.append(f"<span style='color:red;font-weight:bold;'>{html.escape(line)}</span>")
+        elif line.startswith("Extra:"):
+            colored.append(f"<span style='color:black;'>{html.escape(line)}</span>")
+        else:
+            colored.append(html.escape(line))
+
+    return "<br>".join(colored)
+
+
+def difference_table_html(diff_table, index: DiffItemIndex, rows, kind: str = "All", start: int = 1) -> str:
+    """
+    HTML table of the given diff_table rows (positions), with Missing/Extra
+    items colored. S.No starts at `start` so numbering continues across pages.
+    """
+    display_df = (
+        diff_table.iloc[rows][["SG Name", "Column"]]
+        .rename(columns={"SG Name": "Security Group", "Column": "Access Type"})
+        .reset_index(drop=True)
+    )
+    display_df["Difference Items"] = [diff_text(index.items(row, kind)) for row in rows]
+    display_df.insert(0, "S.No", range(start, start + len(display_df)))
+
+    styled_df = display_df.style.format(
+        {"Difference Items": color_diff},
+        escape="html"
+    )
+    return styled_df.hide(axis="index").to_html()
@@ -0,0 +1,200 @@
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from utils.vocabulary import EMPTY_CELL, ItemTranslation, encoded
+
+RESULT_COLUMNS = ["Permission", "Source", "Security Group", "Access Type"]
+
+
+def _alphabetical_rank(texts: np.ndarray) -> np.ndarray:
+    """
+    Rank of each text in case-sensitive alphabetical order.
+    """
+    order = np.argsort(texts.astype(str), kind="stable")
+    rank = np.empty(len(texts), dtype=np.int64)
+    rank[order] = np.arange(len(texts), dtype=np.int64)
+    return rank
+
+
+class _KeyView:
+    """
+    Read-only sequence of the keys packed in a newline-joined string,
+    so bisect can search them without materializing a list.
+    """
+
+    def __init__(self, text: str, starts: np.ndarray):
+        self.text = text
+        self.starts = starts
+
+    def __len__(self):
+        return len(self.starts) - 1
+
+    def __getitem__(self, k):
+        return self.text[self.starts[k]:self.starts[k + 1] - 1]
+
+
+class PermissionIndex:
+    """
+    Item -> (source, SG, access type) inverted index over one or more
+    normalized frames, e.g. {"Client": client_df, "Standard": std_df}.
+
+    Every newline-separated item of every access-type cell is posted once.
+    Item ids of every frame are translated into the first frame's
+    vocabulary, so an item has one id across sources.
+    Item texts are matched case-insensitively: prefix queries bisect a
+    sorted key list, substring queries scan the distinct item texts only
+    (never the postings), so both stay fast on large tenants.
+    """
+
+    def __init__(self, frames: dict):
+        self.sources = list(frames)
+
+        item_parts, source_parts, row_parts, col_parts = [], [], [], []
+        translations = []
+        extra = {}
+        self.sg_names = []
+        self.sg_rank = []
+        column_code = {}
+
+        for source_id, df in enumerate(frames.values()):
+            enc = encoded(df)
+            target = translations[0].target if translations else enc.vocab
+            translations.append(ItemTranslation(enc.vocab, target, extra))
+            names = np.asarray(enc.sg_names, dtype=object)
+            self.sg_names.append(names)
+            self.sg_rank.append(_alphabetical_rank(names))
+            codes = np.array(
+                [column_code.setdefault(col, len(column_code)) for col in enc.columns],
+                dtype=np.int16,
+            )
+
+            rows, cols = np.nonzero(enc.cells != EMPTY_CELL)
+            arrays = [enc.vocab.cells[c] for c in enc.cells[rows, cols]]
+            lengths = np.fromiter((len(a) for a in arrays), dtype=np.int64, count=len(arrays))
+
+            item_parts.append(
+                translations[-1].item_ids[np.concatenate(arrays)]
+                if arrays else np.empty(0, dtype=np.int32)
+            )
+            source_parts.append(np.full(int(lengths.sum()), source_id, dtype=np.int8))
+            row_parts.append(np.repeat(rows, lengths).astype(np.int32))
+            col_parts.append(codes[np.repeat(cols, lengths)])
+
+        self.columns = np.asarray(list(column_code), dtype=object)
+
+        items = np.concatenate(item_parts) if item_parts else np.empty(0, dtype=np.int32)
+        order = np.argsort(items, kind="stable")
+        self.post_item = items[order]
+        self.post_source = np.concatenate(source_parts)[order] if source_parts else np.empty(0, np.int8)
+        self.post_row = np.concatenate(row_parts)[order] if row_parts else np.empty(0, np.int32)
+        self.post_col = np.concatenate(col_parts)[order] if col_parts else np.empty(0, np.int16)
+
+        # distinct items, and their lower-cased text sorted for prefix search
+        self.item_ids, starts = np.unique(self.post_item, return_index=True)
+        self.bounds = np.append(starts, len(self.post_item))
+        # every translation shares `extra`, so any of them names every id
+        text = translations[0].text if translations else None
+        self.texts = np.asarray([text(i) for i in self.item_ids], dtype=object)
+        self.item_rank = _alphabetical_rank(self.texts)
+
+        # the sorted lower-cased keys live in one string, one per line,
+        # instead of one string object per item
+        lower = [t.lower() for t in self.texts]
+        self.prefix_order = np.asarray(
+            sorted(range(len(lower)), key=lower.__getitem__), dtype=np.int64
+        )
+        keys = [lower[i] for i in self.prefix_order]
+        self.haystack = "\n".join(keys) + "\n"
+        self.key_starts = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(k) + 1 for k in keys], out=self.key_starts[1:])
+        self.prefix_keys = _KeyView(self.haystack, self.key_starts)
+
+    def __len__(self):
+        return len(self.post_item)
+
+    def match_items(self, query: str, mode: str = "substring") -> np.ndarray:
+        """
+        Positions (into item_ids) of the distinct items matching the query.
+        """
+        q = query.strip().lower()
+        if not q:
+            return np.empty(0, dtype=np.int64)
+
+        if mode == "prefix":
+            lo = bisect_left(self.prefix_keys, q)
+            hi = bisect_left(self.prefix_keys, q + "\U0010ffff", lo)
+            return np.sort(self.prefix_order[lo:hi])
+        if mode == "substring":
+            if "\n" in q:
+                # items never contain a line break
+                return np.empty(0, dtype=np.int64)
+            # one hit per key: after a match, resume at the next line
+            hits, find = [], self.haystack.find
+            pos = find(q)
+            while pos >= 0:
+                hits.append(pos)
+                pos = find(q, find("\n", pos + len(q)) + 1)
+            keys = np.searchsorted(self.key_starts, np.asarray(hits, dtype=np.int64), side="right") - 1
+            return np.sort(self.prefix_order[keys])
+        raise ValueError(f"Unknown search mode: {mode!r}")
+
+    def search(self, query: str, mode: str = "substring", sources=None, limit: int = None):
+        """
+        Matches of a permission query as (results, matched item count,
+        total match count). Results hold one row per (permission, source,
+        SG, access type), ordered by permission, then source and SG.
+        """
+        matched = self.match_items(query, mode)
+        if len(matched) == 0:
+            return pd.DataFrame(columns=RESULT_COLUMNS), 0, 0
+
+        # matched items in alphabetical order; their postings stay grouped
+        matched = matched[np.argsort(self.item_rank[matched], kind="stable")]
+        starts, ends = self.bounds[matched], self.bounds[matched + 1]
+        lengths = ends - starts
+        postings = np.repeat(ends - lengths.cumsum(), lengths) + np.arange(lengths.sum())
+        item_pos = np.repeat(matched, lengths)
+
+        if sources is not None:
+            wanted = [self.sources.index(s) for s in sources]
+            keep = np.isin(self.post_source[postings], wanted)
+            postings, item_pos = postings[keep], item_pos[keep]
+
+        n_items = len(np.unique(item_pos))
+        total = len(postings)
+
+        # with a limit, only the item groups reaching into it need sorting
+        if limit is not None and total > limit:
+            tail = np.flatnonzero(item_pos[limit:] != item_pos[limit - 1])
+            end = limit + (tail[0] if len(tail) else total - limit)
+            postings, item_pos = postings[:end], item_pos[:end]
+
+        source = self.post_source[postings]
+        row = self.post_row[postings]
+
+        # order by permission, source, SG name using precomputed ranks
+        sg_rank = np.empty(len(postings), dtype=np.int64)
+        for source_id, ranks in enumerate(self.sg_rank):
+            here = source == source_id
+            sg_rank[here] = ranks[row[here]]
+        order = np.lexsort((sg_rank, source, self.item_rank[item_pos]))
+        if limit is not None:
+            order = order[:limit]
+
+        postings, item_pos = postings[order], item_pos[order]
+        source, row = source[order], row[order]
+
+        sg = np.empty(len(order), dtype=object)
+        for source_id, names in enumerate(self.sg_names):
+            here = source == source_id
+            sg[here] = names[row[here]]
+
+        results = pd.DataFrame({
+            "Permission": self.texts[item_pos],
+            "Source": np.asarray(self.sources, dtype=object)[source],
+            "Security Group": sg,
+            "Access Type": self.columns[self.post_col[postings]],
+        })
+        return results, n_items, total
@@ -1,57 +1,376 @@
+import numpy as np
 import pandas as pd
-from itertools import combinations
 
-def _row_items(row: pd.Series):
+from utils.vocabulary import encoded
+
+# Rows of the SG x item matrix multiplied per block, to bound the size
+# of the intermediate intersection matrix on large tenants.
+BLOCK_ROWS = 2048
+
+# Candidate pairs verified per block in the approximate (MinHash) mode.
+VERIFY_PAIRS = 200_000
+
+# Lowest similarity kept by SimilarityPairs; any threshold at or above it
+# is served without recomputation.
+SIMILARITY_FLOOR = 0.50
+
+# Share of exact pairs at the default 0.90 threshold that the MinHash mode
+# must find with its default num_perm and bands (see compute_similarity;
+# checked by tests/test_similarity_recall.py).
+MINHASH_RECALL_TARGET = 0.99
+
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+
+
+def _pairs_frame(sg_names, left, right, sims) -> pd.DataFrame:
+    names = np.asarray(sg_names, dtype=object)
+    return pd.DataFrame({
+        "SG 1": names[left],
+        "SG 2": names[right],
+        "Similarity": [round(float(s) * 100, 2) for s in sims],
+    })
+
+
+def _exact_pair_blocks(matrix, sizes, threshold, rows=None):
+    """
+    Pairs i < j with Jaccard >= threshold from blocked X @ X.T products,
+    yielded per block as (rows done, rows total, left, right, similarity).
+    With `rows`, only pairs involving at least one of those rows are scored.
+    """
+    matrix_t = matrix.T.tocsr()
+
+    if rows is None:
+        rows = np.arange(matrix.shape[0], dtype=np.int64)
+    selected = np.zeros(matrix.shape[0], dtype=bool)
+    selected[rows] = True
+
+    for start in range(0, len(rows), BLOCK_ROWS):
+        block = rows[start:start + BLOCK_ROWS]
+        inter = (matrix[block] @ matrix_t).tocoo()
+
+        left = block[inter.row].astype(np.int64)
+        right = inter.col.astype(np.int64)
+        # a pair within `rows` is seen from both sides; keep it once
+        keep = (right != left) & (~selected[right] | (right > left))
+        left, right, shared = left[keep], right[keep], inter.data[keep]
+        left, right = np.minimum(left, right), np.maximum(left, right)
+
+        sim = shared / (sizes[left] + sizes[right] - shared)
+        keep = sim >= threshold
+
+        yield start + len(block), len(rows), left[keep], right[keep], sim[keep]
+
+
+def _exact_pairs(matrix, sizes, threshold, rows=None):
     """
-    Build a set of permission 'items' from all permission columns in a row.
-    Split on newlines, strip, ignore empty.
+    All pairs i < j with Jaccard >= threshold (see _exact_pair_blocks).
     """
-    items = set()
-    for col, val in row.items():
-        if col == "SG Name":
-            continue
-        if pd.isna(val):
-            continue
-        # each cell may contain multiple entries separated by newlines
-        for part in str(val).splitlines():
-            part = part.strip()
-            if part:
-                items.add(part)
-    return items
+    lefts, rights, sims = [], [], []
+    for _, _, left, right, sim in _exact_pair_blocks(matrix, sizes, threshold, rows):
+        lefts.append(left)
+        rights.append(right)
+        sims.append(sim)
+
+    return _concat(lefts, np.int64), _concat(rights, np.int64), _concat(sims, np.float64)
+
 
-def compute_similarity(df: pd.DataFrame, threshold: float = 0.90) -> pd.DataFrame:
+def _minhash_signatures(matrix, num_perm, seed):
+    """
+    MinHash signature (num_perm values) for every non-empty row of the
+    matrix, using universal hashes h(x) = (a * x + b) mod p over item ids.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    nonempty = np.flatnonzero(np.diff(matrix.indptr))
+    starts = matrix.indptr[nonempty]
+    items = matrix.indices.astype(np.uint64)
+
+    signatures = np.empty((len(nonempty), num_perm), dtype=np.uint64)
+    for k in range(num_perm):
+        hashed = (a[k] * items + b[k]) % _MERSENNE_PRIME
+        signatures[:, k] = np.minimum.reduceat(hashed, starts) if len(starts) else hashed[:0]
+
+    return nonempty, signatures
+
+
+def _lsh_candidates(matrix, num_perm, bands, seed):
+    """
+    Candidate pairs (i < j) that collide in at least one LSH band.
+    """
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+
+    rows_per_band = num_perm // bands
+    row_ids, signatures = _minhash_signatures(matrix, num_perm, seed)
+    n = matrix.shape[0]
+
+    keys = []
+    for band in range(bands):
+        chunk = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        _, bucket, counts = np.unique(
+            chunk, axis=0, return_inverse=True, return_counts=True
+        )
+        bucket = bucket.ravel()
+
+        # only buckets holding two or more SGs produce candidates
+        colliding = np.flatnonzero(counts[bucket] > 1)
+        order = colliding[np.argsort(bucket[colliding], kind="stable")]
+        bounds = np.flatnonzero(np.diff(bucket[order])) + 1
+        for members in np.split(order, bounds):
+            if len(members) < 2:
+                continue
+            i, j = np.triu_indices(len(members), k=1)
+            left, right = row_ids[members[i]], row_ids[members[j]]
+            keys.append(np.minimum(left, right) * n + np.maximum(left, right))
+
+    keys = np.unique(_concat(keys, np.int64))
+    return keys // n, keys % n
+
+
+def _verify_pairs(matrix, sizes, left, right, threshold):
+    """
+    Exact Jaccard for the given candidate pairs; keeps those >= threshold.
+    """
+    lefts, rights, sims = [], [], []
+
+    for start in range(0, len(left), VERIFY_PAIRS):
+        l = left[start:start + VERIFY_PAIRS]
+        r = right[start:start + VERIFY_PAIRS]
+        shared = np.asarray(matrix[l].multiply(matrix[r]).sum(axis=1)).ravel()
+
+        sim = shared / (sizes[l] + sizes[r] - shared)
+        keep = sim >= threshold
+
+        lefts.append(l[keep])
+        rights.append(r[keep])
+        sims.append(sim[keep])
+
+    return _concat(lefts, np.int64), _concat(rights, np.int64), _concat(sims, np.float64)
+
+
+def _concat(parts, dtype):
+    return np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+
+
+def compute_similarity(
+    df: pd.DataFrame,
+    threshold: float = 0.90,
+    method: str = "exact",
+    num_perm: int = 128,
+    bands: int = 16,
+    seed: int = 0,
+) -> pd.DataFrame:
     """
     Jaccard similarity between SGs based on permission items.
-    Only returns pairs with similarity >= threshold.
+    Only returns pairs with similarity >= threshold (threshold > 0).
+
+    method="exact" scores every pair sharing at least one item through the
+    sparse product X @ X.T of the SG x item matrix.
+
+    method="minhash" is an approximate mode for very large tenants: pairs
+    are only considered if their MinHash signatures (num_perm hashes) agree
+    on all rows of at least one of `bands` LSH bands, then verified exactly.
+    A pair with similarity s becomes a candidate with probability
+    1 - (1 - s ** (num_perm / bands)) ** bands, so more bands (fewer rows
+    per band) raises recall at the cost of more candidates to verify.
+    With the defaults (8 rows per band) a pair right at 0.90 is missed with
+    probability about 1e-4, so recall at that threshold is expected to
+    reach MINHASH_RECALL_TARGET. Reported similarities are always exact;
+    only recall is approximate.
+    """
+
+    enc = encoded(df)
+    sg_names = enc.sg_names
+
+    matrix = enc.item_matrix()
+    sizes = np.asarray(matrix.sum(axis=1)).ravel()
+
+    if method == "exact":
+        left, right, sim = _exact_pairs(matrix, sizes, threshold)
+    elif method == "minhash":
+        cand_left, cand_right = _lsh_candidates(matrix, num_perm, bands, seed)
+        left, right, sim = _verify_pairs(matrix, sizes, cand_left, cand_right, threshold)
+    else:
+        raise ValueError(f"Unknown similarity method: {method!r}")
+
+    order = np.lexsort((right, left))
+    return _pairs_frame(sg_names, left[order], right[order], sim[order])
+
+
+def compute_similarity_for(df: pd.DataFrame, sg_names, threshold: float = 0.90) -> pd.DataFrame:
+    """
+    Exact similarity pairs (same frame as compute_similarity) restricted to
+    pairs involving at least one of the given SGs. Used to refresh only the
+    pairs touched by SGs that changed between two snapshots.
+    """
+    enc = encoded(df)
+    left, right, sim = _exact_pairs_for(enc, sg_names, threshold)
+    order = np.lexsort((right, left))
+    return _pairs_frame(enc.sg_names, left[order], right[order], sim[order])
+
+
+def _exact_pairs_for(enc, sg_names, threshold):
+    wanted = set(sg_names)
+    rows = np.array(
+        [pos for pos, sg in enumerate(enc.sg_names) if sg in wanted], dtype=np.int64
+    )
+    matrix = enc.item_matrix()
+    sizes = np.asarray(matrix.sum(axis=1)).ravel()
+    return _exact_pairs(matrix, sizes, threshold, rows=rows)
+
+
+def iter_similarity_blocks(df: pd.DataFrame, floor: float = SIMILARITY_FLOOR):
+    """
+    Exact similarity computed block by block, for progress reporting.
+    Yields (rows done, rows total, left, right, similarity) with row
+    positions into encoded(df).sg_names; collect the blocks with
+    SimilarityPairs.
+    """
+    enc = encoded(df)
+
+    matrix = enc.item_matrix()
+    sizes = np.asarray(matrix.sum(axis=1)).ravel()
+
+    if matrix.shape[0] == 0:
+        empty = np.empty(0, dtype=np.int64)
+        yield 0, 0, empty, empty, np.empty(0)
+        return
+
+    yield from _exact_pair_blocks(matrix, sizes, floor)
+
+
+class SimilarityPairs:
     """
+    Every SG pair with similarity >= floor, held as flat arrays sorted by
+    similarity (best first). The pairs above any threshold >= floor are a
+    prefix of the arrays found by binary search, so changing the threshold
+    never reruns the pairwise pass.
+    """
+
+    def __init__(self, sg_names, left, right, sim, floor: float = SIMILARITY_FLOOR):
+        order = np.lexsort((right, left, -sim))
+        self.sg_names = np.asarray(sg_names, dtype=object)
+        self.left = left[order].astype(np.int32)
+        self.right = right[order].astype(np.int32)
+        self.sim = sim[order].astype(np.float64)
+        self.floor = floor
+
+    @classmethod
+    def from_blocks(cls, sg_names, blocks, floor: float = SIMILARITY_FLOOR):
+        """
+        Pairs from (left, right, similarity) blocks, e.g. as collected
+        from iter_similarity_blocks.
+        """
+        blocks = list(blocks)
+        return cls(
+            sg_names,
+            _concat([b[0] for b in blocks], np.int64),
+            _concat([b[1] for b in blocks], np.int64),
+            _concat([b[2] for b in blocks], np.float64),
+            floor,
+        )
 
-    df = df.copy()
-    sg_names = df["SG Name"].tolist()
-    item_sets = [_row_items(row) for _, row in df.iterrows()]
+    def __len__(self):
+        return len(self.sim)
+
+    def count(self, threshold: float) -> int:
+        """
+        Number of pairs with similarity >= threshold.
+        """
+        if threshold < self.floor:
+            raise ValueError(f"Threshold {threshold} is below the floor {self.floor}")
+        return len(self.sim) - int(np.searchsorted(self.sim[::-1], threshold, side="left"))
+
+    def frame(self, threshold: float = 0.90, order: str = "pair") -> pd.DataFrame:
+        """
+        Pairs with similarity >= threshold as a compute_similarity frame.
+        order="pair" matches compute_similarity(df, threshold) exactly;
+        order="score" lists the most similar pairs first.
+        """
+        n = self.count(threshold)
+        left, right, sim = self.left[:n], self.right[:n], self.sim[:n]
+        if order == "pair":
+            keep = np.lexsort((right, left))
+            left, right, sim = left[keep], right[keep], sim[keep]
+        elif order != "score":
+            raise ValueError(f"Unknown pair order: {order!r}")
+        return _pairs_frame(self.sg_names, left, right, sim)
+
+
+def similarity_pairs(df: pd.DataFrame, floor: float = SIMILARITY_FLOOR) -> SimilarityPairs:
+    """
+    Exact SG pairs with similarity >= floor, ready to slice at any higher
+    threshold.
+    """
+    blocks = [block[2:] for block in iter_similarity_blocks(df, floor)]
+    return SimilarityPairs.from_blocks(encoded(df).sg_names, blocks, floor)
+
+
+def similarity_pairs_for(df: pd.DataFrame, sg_names, floor: float = SIMILARITY_FLOOR) -> SimilarityPairs:
+    """
+    SimilarityPairs restricted to pairs involving at least one of the
+    given SGs (see compute_similarity_for).
+    """
+    enc = encoded(df)
+    left, right, sim = _exact_pairs_for(enc, sg_names, floor)
+    return SimilarityPairs(enc.sg_names, left, right, sim, floor)
+
+
+class NeighborIndex:
+    """
+    Item -> SG inverted index over one frame, for "most similar SGs" lookups.
+
+    nearest() scores only the SGs sharing at least one item with the
+    selected SG (read off the posting lists of its items), so a lookup
+    costs the size of those lists rather than a scan over every SG.
+    """
 
-    rows = []
-    n = len(sg_names)
+    def __init__(self, df: pd.DataFrame):
+        enc = encoded(df)
+        self.sg_names = np.asarray(enc.sg_names, dtype=object)
+        self.row_of = enc.row_of
 
-    for i, j in combinations(range(n), 2):
-        a = item_sets[i]
-        b = item_sets[j]
+        # only the sparsity structure is kept: the all-ones data arrays of
+        # the matrix and its transpose are dropped
+        matrix = enc.item_matrix()
+        postings = matrix.T.tocsr()
+        self.item_indptr, self.item_indices = matrix.indptr, matrix.indices
+        self.post_indptr, self.post_indices = postings.indptr, postings.indices
+        self.sizes = np.diff(self.item_indptr)
 
-        if not a and not b:
-            continue
+    def nearest(self, sg, k: int = 10, threshold: float = 0.0) -> pd.DataFrame:
+        """
+        Up to k SGs most similar to `sg` (Jaccard over permission items)
+        with similarity >= threshold, best first. Similarity is a
+        percentage as in compute_similarity; Shared Items counts the
+        items in common.
+        """
+        row = self.row_of.get(sg)
+        if row is None or not self.sizes[row]:
+            return pd.DataFrame(columns=["Security Group", "Similarity", "Shared Items"])
 
-        inter = len(a & b)
-        union = len(a | b)
+        items = self.item_indices[self.item_indptr[row]:self.item_indptr[row + 1]]
+        starts, ends = self.post_indptr[items], self.post_indptr[items + 1]
+        hits = np.concatenate([self.post_indices[a:b] for a, b in zip(starts, ends)])
 
-        if union == 0:
-            continue
+        candidates, shared = np.unique(hits, return_counts=True)
+        keep = candidates != row
+        candidates, shared = candidates[keep], shared[keep]
 
-        sim = inter / union
+        sim = shared / (self.sizes[row] + self.sizes[candidates] - shared)
+        keep = sim >= threshold
+        candidates, shared, sim = candidates[keep], shared[keep], sim[keep]
 
-        if sim >= threshold:
-            rows.append({
-                "SG 1": sg_names[i],
-                "SG 2": sg_names[j],
-                "Similarity": round(sim * 100, 2)
-            })
+        if len(candidates) > k:
+            top = np.argpartition(-sim, k - 1)[:k]
+            candidates, shared, sim = candidates[top], shared[top], sim[top]
 
-    return pd.DataFrame(rows)
+        names = self.sg_names[candidates]
+        order = np.lexsort((names.astype(str), -sim))
+        return pd.DataFrame({
+            "Security Group": names[order],
+            "Similarity": [round(float(s) * 100, 2) for s in sim[order]],
+            "Shared Items": shared[order].astype(np.int64),
+        })
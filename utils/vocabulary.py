@@ -0,0 +1,373 @@
+import sys
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Cell id of an empty / missing cell in every vocabulary.
+EMPTY_CELL = 0
+
+
+def split_items(value):
+    """
+    Split a permission cell into its items.
+    Split on newlines, strip, ignore empty.
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return []
+    return [part.strip() for part in str(value).splitlines() if part.strip()]
+
+
+class ItemVocabulary:
+    """
+    Append-only interning tables of one encoded dataframe:
+
+      - items: permission item text <-> integer item id
+      - cells: distinct cell contents, each a sorted, unique int32 array
+        of item ids, <-> integer cell id
+
+    Ids are never reassigned, so frames encoded against the same
+    vocabulary can be compared id-for-id; frames with vocabularies of
+    their own are compared through an ItemTranslation.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.items = []
+        self._item_ids = {}
+        self.cells = [np.empty(0, dtype=np.int32)]
+        self._cell_ids = {b"": EMPTY_CELL}
+        self._reset_flat()
+
+    def _reset_flat(self):
+        self._flat_cells = 1
+        self._flat_offsets = np.zeros(2, dtype=np.int64)
+        self._flat_items = np.empty(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate deep size: item texts (counted once, the id map shares
+        them), cell arrays, their byte keys and the tables' own storage.
+        """
+        return (
+            sys.getsizeof(self.items) + sum(map(sys.getsizeof, self.items))
+            + sys.getsizeof(self._item_ids) + sum(map(sys.getsizeof, self._item_ids.values()))
+            + sys.getsizeof(self.cells) + sum(a.nbytes for a in self.cells)
+            + sys.getsizeof(self._cell_ids) + sum(map(sys.getsizeof, self._cell_ids))
+            + sum(map(sys.getsizeof, self._cell_ids.values()))
+            + self._flat_offsets.nbytes + self._flat_items.nbytes
+        )
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        for key in ("_flat_cells", "_flat_offsets", "_flat_items"):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._reset_flat()
+
+    def flat_cells(self):
+        """
+        (offsets, items): every cell's item ids in one array, cell k being
+        items[offsets[k]:offsets[k + 1]]. Built once and extended only by
+        the cells interned since.
+        """
+        with self._lock:
+            done, total = self._flat_cells, len(self.cells)
+            if done < total:
+                new = self.cells[done:total]
+                lengths = np.fromiter((len(a) for a in new), dtype=np.int64, count=len(new))
+                self._flat_offsets = np.concatenate(
+                    [self._flat_offsets, self._flat_offsets[-1] + np.cumsum(lengths)]
+                )
+                self._flat_items = np.concatenate([self._flat_items, *new]).astype(np.int32)
+                self._flat_cells = total
+            return self._flat_offsets, self._flat_items
+
+    def intern_cells(self, values) -> np.ndarray:
+        """
+        Parse raw cells and return the id of each one's (interned) item array.
+        """
+        out = np.empty(len(values), dtype=np.int32)
+        with self._lock:
+            for k, value in enumerate(values):
+                out[k] = self._intern_cell(value)
+        return out
+
+    def _intern_cell(self, value) -> int:
+        parts = split_items(value)
+        if not parts:
+            return EMPTY_CELL
+
+        ids = []
+        for part in parts:
+            item_id = self._item_ids.get(part)
+            if item_id is None:
+                item_id = len(self.items)
+                self._item_ids[part] = item_id
+                self.items.append(part)
+            ids.append(item_id)
+
+        arr = np.unique(np.asarray(ids, dtype=np.int32))
+        key = arr.tobytes()
+        cell_id = self._cell_ids.get(key)
+        if cell_id is None:
+            cell_id = len(self.cells)
+            self._cell_ids[key] = cell_id
+            self.cells.append(arr)
+        return cell_id
+
+    def decode(self, ids):
+        """
+        Item texts for an array of item ids, sorted alphabetically.
+        """
+        return sorted(self.items[i] for i in ids)
+
+    def cell_difference(self, std_cell: int, client_cell: int):
+        """
+        (missing, extra) item ids between a standard and a client cell.
+        """
+        std_ids = self.cells[std_cell]
+        client_ids = self.cells[client_cell]
+        return _sorted_difference(std_ids, client_ids), _sorted_difference(client_ids, std_ids)
+
+
+def _sorted_difference(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Elements of sorted array a not in sorted array b.
+    (np.setdiff1d re-sorts its inputs; cell arrays are already sorted.)
+    """
+    if not len(a) or not len(b):
+        return a
+    pos = np.searchsorted(b, a)
+    found = b[np.minimum(pos, len(b) - 1)] == a
+    return a[~found]
+
+
+class ItemTranslation:
+    """
+    Cells of a source vocabulary (a standard baseline's) read in the item
+    ids of a target vocabulary (an upload's), so frames encoded once
+    against vocabularies of their own can still be compared.
+
+    Every source item is looked up once by text (O(distinct items), no
+    cell is re-tokenized). Source items the target lacks get ids from
+    len(target) on, through the `extra` table (text -> id), which several
+    translations into the same target may share.
+    """
+
+    def __init__(self, source: ItemVocabulary, target: ItemVocabulary, extra: dict = None):
+        self.source = source
+        self.target = target
+        self.extra = {} if extra is None else extra
+        self.identity = source is target
+        self._extra_texts = []
+
+        if self.identity:
+            self.item_ids = np.arange(len(source), dtype=np.int32)
+            return
+        base = len(target)
+        ids = np.empty(len(source), dtype=np.int32)
+        for k, text in enumerate(source.items):
+            item_id = target._item_ids.get(text)
+            if item_id is None:
+                item_id = self.extra.setdefault(text, base + len(self.extra))
+            ids[k] = item_id
+        self.item_ids = ids
+
+    def text(self, item_id: int) -> str:
+        """
+        Item text of a translated (target-side) item id.
+        """
+        if item_id < len(self.target):
+            return self.target.items[item_id]
+        if len(self._extra_texts) != len(self.extra):
+            self._extra_texts = sorted(self.extra, key=self.extra.__getitem__)
+        return self._extra_texts[item_id - len(self.target)]
+
+    def cell_items(self, source_cell: int) -> np.ndarray:
+        """
+        Sorted target-side item ids of a source cell.
+        """
+        if self.identity:
+            return self.source.cells[source_cell]
+        return np.sort(self.item_ids[self.source.cells[source_cell]])
+
+    def cell_difference(self, source_cell: int, target_cell: int):
+        """
+        (missing, extra) target-side item ids between a source (standard)
+        and a target (client) cell.
+        """
+        std_ids = self.cell_items(source_cell)
+        client_ids = self.target.cells[target_cell]
+        return _sorted_difference(std_ids, client_ids), _sorted_difference(client_ids, std_ids)
+
+    def differs(self, source_cells: np.ndarray, target_cells: np.ndarray) -> np.ndarray:
+        """
+        Whether each source cell holds a different item set than the
+        target cell at the same position (arrays of any matching shape).
+        """
+        if self.identity:
+            return source_cells != target_cells
+        shape = np.shape(source_cells)
+        source_cells = np.asarray(source_cells).ravel()
+        target_cells = np.asarray(target_cells).ravel()
+
+        s_offsets, s_items = self.source.flat_cells()
+        t_offsets, t_items = self.target.flat_cells()
+        s_start, t_start = s_offsets[source_cells], t_offsets[target_cells]
+        lengths = s_offsets[source_cells + 1] - s_start
+        out = lengths != t_offsets[target_cells + 1] - t_start
+
+        # equal-length pairs: compare the sorted translated items in bulk
+        same = np.flatnonzero(~out & (lengths > 0))
+        if len(same):
+            lengths = lengths[same]
+            seg = np.repeat(np.arange(len(same)), lengths)
+            pos = np.arange(len(seg)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            left = self.item_ids[s_items[s_start[same][seg] + pos]]
+            right = t_items[t_start[same][seg] + pos]
+            left = left[np.lexsort((left, seg))]
+            out[same] = np.bincount(seg[left != right], minlength=len(same)) > 0
+        return out.reshape(shape)
+
+
+class EncodedFrame:
+    """
+    A normalized dataframe tokenized once against a vocabulary:
+    one row per SG and one cell id per access-type column.
+    """
+
+    def __init__(self, sg_names, columns, cells, vocab):
+        self.sg_names = sg_names
+        self.columns = list(columns)
+        self.cells = cells
+        self.vocab = vocab
+
+        self.row_of = {}
+        for pos, sg in enumerate(sg_names):
+            self.row_of.setdefault(sg, pos)
+        self.column_of = {col: pos for pos, col in enumerate(self.columns)}
+
+    def lookup(self, sgs, columns) -> np.ndarray:
+        """
+        Cell ids for parallel sequences of SG names and column names.
+        Unknown SGs or columns read as empty cells.
+        """
+        out = np.full(len(sgs), EMPTY_CELL, dtype=np.int32)
+        for k, (sg, col) in enumerate(zip(sgs, columns)):
+            row = self.row_of.get(sg)
+            pos = self.column_of.get(col)
+            if row is not None and pos is not None:
+                out[k] = self.cells[row, pos]
+        return out
+
+    def column_cells(self, columns) -> np.ndarray:
+        """
+        Cell-id matrix (SG x columns), with empty cells for absent columns.
+        """
+        out = np.full((len(self.sg_names), len(columns)), EMPTY_CELL, dtype=np.int32)
+        for k, col in enumerate(columns):
+            pos = self.column_of.get(col)
+            if pos is not None:
+                out[:, k] = self.cells[:, pos]
+        return out
+
+    def take(self, rows) -> "EncodedFrame":
+        """
+        Encoding of the given row positions, sharing this vocabulary.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        return EncodedFrame(self.sg_names[rows], self.columns, self.cells[rows], self.vocab)
+
+    def item_matrix(self) -> sparse.csr_matrix:
+        """
+        Sparse binary SG x item matrix over all access-type columns.
+        """
+        flat = self.cells.ravel()
+        nonempty = np.flatnonzero(flat != EMPTY_CELL)
+        arrays = [self.vocab.cells[cell] for cell in flat[nonempty]]
+        lengths = np.fromiter((len(a) for a in arrays), dtype=np.int64, count=len(arrays))
+
+        rows = np.repeat(nonempty // max(self.cells.shape[1], 1), lengths)
+        ids = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int32)
+
+        matrix = sparse.csr_matrix(
+            (np.ones(len(ids), dtype=np.int32), (rows, ids)),
+            shape=(len(self.sg_names), len(self.vocab)),
+        )
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        return matrix
+
+
+def encode_frame(df: pd.DataFrame, vocab: ItemVocabulary = None) -> EncodedFrame:
+    """
+    Tokenize every access-type cell of a normalized dataframe, against a
+    new vocabulary unless one is given.
+    Each distinct cell text is parsed only once per column.
+    """
+    vocab = ItemVocabulary() if vocab is None else vocab
+    columns = [col for col in df.columns if col != "SG Name"]
+
+    cells = np.empty((len(df), len(columns)), dtype=np.int32)
+    for pos, col in enumerate(columns):
+        codes, uniques = pd.factorize(df[col], use_na_sentinel=True)
+        cell_ids = np.append(vocab.intern_cells(uniques), EMPTY_CELL)
+        # code -1 (missing) picks the trailing EMPTY_CELL
+        cells[:, pos] = cell_ids[codes]
+
+    sg_names = df["SG Name"].to_numpy(dtype=object)
+    return EncodedFrame(sg_names, columns, cells, vocab)
+
+
+_ENCODED = {}
+_ENCODED_LOCK = threading.Lock()
+
+
+def encoded(df: pd.DataFrame) -> EncodedFrame:
+    """
+    Encoded form of a loaded dataframe, built once per dataframe object
+    and reused until that object is garbage collected.
+    Loaded dataframes are treated as read-only.
+
+    Each frame is tokenized into a vocabulary of its own, freed with it;
+    frames are compared across vocabularies through ItemTranslation.
+    """
+    with _ENCODED_LOCK:
+        hit = _ENCODED.get(id(df))
+        if hit is not None and hit[0]() is df:
+            return hit[1]
+
+    return _remember(df, encode_frame(df))
+
+
+def encoded_rows(df: pd.DataFrame, parent: pd.DataFrame, rows) -> EncodedFrame:
+    """
+    Encoding of `df`, the rows at positions `rows` of `parent`, cut from
+    the parent's encoding instead of tokenizing it again, and cached for
+    `df` like encoded(df).
+    """
+    return _remember(df, encoded(parent).take(rows))
+
+
+def _remember(df: pd.DataFrame, enc: EncodedFrame) -> EncodedFrame:
+    key = id(df)
+
+    def _forget(_, key=key):
+        with _ENCODED_LOCK:
+            _ENCODED.pop(key, None)
+
+    with _ENCODED_LOCK:
+        _ENCODED[key] = (weakref.ref(df, _forget), enc)
+    return enc